@@ -1,22 +1,30 @@
 from fastapi import APIRouter, Request, HTTPException, status, Depends
-from fastapi.responses import Response, JSONResponse
+from fastapi.responses import Response, StreamingResponse
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+import asyncio
+import httpx
+import logging
+import time
 from fastapi.security import OAuth2PasswordBearer
-from httpx import AsyncClient
-from jose import jwt, JWTError
+from jose import JWTError
 from app.config import settings
+from app.upstream import upstream_clients
+from app.balancer import Replica
+from app.resilience import RETRYABLE_ERRORS, RETRYABLE_STATUSES, UpstreamUnavailable, is_retryable, retry_delay
+from app.log import access_log, logger
+from app.tokens import INTERNAL_CLAIMS_HEADER, sign_claims, verify_token
+from app.response_cache import response_cache
 
 
 router = APIRouter()
 
-# Service URLs (internal docker-compose network)
+# Service replica URLs (internal docker-compose network); UPSTREAM_REPLICAS overrides per service
 SERVICES = {
-    "users": "http://user_services:8000",
-    "parking": "http://parking_services:8000"
+    "users": ["http://user_services:8000"],
+    "parking": ["http://parking_services:8000"],
+    **settings.UPSTREAM_REPLICAS,
 }
 
-# Shared HTTP client
-client = AsyncClient(timeout=30.0)
-
 # OAuth2 token dependency (gateway handles auth at /login/)
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="http://localhost:8002/login"  # external gateway route
@@ -25,51 +33,222 @@ oauth2_scheme = OAuth2PasswordBearer(
 # ---------------------------
 # Utility functions
 # ---------------------------
-async def forward_request(target_url: str, request: Request) -> Response:
-    """Forward the incoming request to the target service."""
+# Hop-by-hop headers apply to a single connection and are never forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade",
+}
+
+
+class _Relay:
+    """Pipes an upstream body through chunk by chunk and releases the upstream slot exactly once.
+
+    Release happens when the body is exhausted, fails or is cancelled, or in
+    aclose() for a body that was never iterated (the client went away first).
+    """
+
+    def __init__(self, service_name: str, replica: Replica, resp: httpx.Response):
+        self.service_name = service_name
+        self.replica = replica
+        self.resp = resp
+        self._released = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self.resp.aiter_raw():
+                yield chunk
+        finally:
+            await self.aclose()
+
+    async def read(self) -> bytes:
+        """The whole body with its content-encoding undone, for callers that re-serialize it."""
+        try:
+            return await self.resp.aread()
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if self._released:
+            return
+        self._released = True
+        # synchronous, so a cancellation during the close below cannot skip it
+        upstream_clients.end(self.service_name, self.replica)
+        await asyncio.shield(self.resp.aclose())
+
+
+class RelayResponse(StreamingResponse):
+    body_iterator: _Relay
+
+    async def read(self) -> bytes:
+        """Read the decoded body instead of sending the response; releases the upstream slot."""
+        return await self.body_iterator.read()
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+
+async def _send_upstream(
+    service_name: str,
+    path: str,
+    request: Request,
+    claims: Optional[Dict[str, Any]] = None,
+) -> Tuple[httpx.Response, Replica]:
+    """Send the incoming request to a replica of `service_name` and return the response with its body still unread.
+
+    Idempotent requests without a body are retried with jittered backoff on
+    connect and pool errors and 502/503/504, preferring replicas not yet
+    tried; read timeouts and other errors after the request was sent are not. The
+    request is recorded with the breaker and the replica pool once, after its
+    last attempt. The caller must close the response and call
+    upstream_clients.end(service_name, replica).
+    """
     method = request.method
-    headers = dict(request.headers)
-    headers.pop("host", None)
+    # clients must never be able to supply their own internal claims
+    headers = {
+        k: v for k, v in request.headers.items()
+        if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in ("host", INTERNAL_CLAIMS_HEADER)
+    }
+    signed_claims = sign_claims(claims) if claims else None
+    if signed_claims:
+        headers[INTERNAL_CLAIMS_HEADER] = signed_claims
     params = dict(request.query_params)
-    content = await request.body()
-
-    # Debug: log forwarding info
-    print(f"[gateway] Forwarding {method} {request.url.path} -> {target_url}")
-    resp = await client.request(
-        method=method,
-        url=target_url,
-        headers=headers,
-        params=params,
-        content=content,
-    )
-
-    content_type = resp.headers.get("content-type", "")
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+
+    attempts = 1 + (settings.UPSTREAM_RETRIES if is_retryable(method, has_body) else 0)
+    tried: Set[str] = set()
+    # replica url -> (replica, ok) for the latest attempt on it
+    outcomes: Dict[str, Tuple[Replica, bool]] = {}
+    admitted = False
+    try:
+        for attempt in range(1, attempts + 1):
+            started = time.perf_counter()
+            client, replica = await upstream_clients.begin(service_name, avoid=tried, admitted=admitted)
+            admitted = True
+            tried.add(replica.url)
+            target_url = replica.url + path
+            try:
+                upstream_request = client.build_request(
+                    method=method,
+                    url=target_url,
+                    headers=headers,
+                    params=params,
+                    content=request.stream() if has_body else None,
+                )
+                resp = await client.send(upstream_request, stream=True)
+            except Exception as e:
+                upstream_clients.end(service_name, replica)
+                access_log.failed(method, request.url.path, target_url, started, e)
+                if isinstance(e, httpx.TransportError):
+                    outcomes[replica.url] = (replica, False)
+                if isinstance(e, RETRYABLE_ERRORS) and attempt < attempts:
+                    await asyncio.sleep(retry_delay(attempt))
+                    continue
+                raise
+            except BaseException:
+                upstream_clients.end(service_name, replica)
+                raise
+
+            ok = resp.status_code not in RETRYABLE_STATUSES
+            outcomes[replica.url] = (replica, ok)
+            access_log.proxied(method, request.url.path, target_url, resp.status_code, started)
+            if not ok and attempt < attempts:
+                # release first: the awaits below can be cancelled
+                upstream_clients.end(service_name, replica)
+                await resp.aclose()
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+            break
+    except Exception:
+        # not admitted: begin() already handed back what it took
+        if admitted:
+            if outcomes:
+                upstream_clients.settle(service_name, outcomes.values(), ok=False)
+            else:
+                upstream_clients.breakers[service_name].cancel_trial()
+        raise
+    except BaseException:
+        # cancelled (e.g. the client went away): hand back any half-open
+        # trial slot without judging the upstream
+        if admitted:
+            upstream_clients.breakers[service_name].cancel_trial()
+        raise
+
+    upstream_clients.settle(service_name, outcomes.values(), ok=outcomes[replica.url][1])
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("upstream response", extra={"fields": {
+            "target": target_url,
+            "content_type": resp.headers.get("content-type"),
+            "content_length": resp.headers.get("content-length"),
+        }})
+    return resp, replica
+
+
+async def forward_request(
+    service_name: str,
+    path: str,
+    request: Request,
+    claims: Optional[Dict[str, Any]] = None,
+) -> Response:
+    """Stream the incoming request to the target service and its response back, without buffering or decoding bodies."""
+    resp, replica = await _send_upstream(service_name, path, request, claims)
+    # raw (still encoded) bytes are relayed, so content-encoding/length stay valid
     safe_headers = {
         k: v for k, v in resp.headers.items()
-        if k.lower() not in ("transfer-encoding", "content-encoding", "content-length", "connection")
+        if k.lower() not in HOP_BY_HOP_HEADERS
     }
+    return RelayResponse(_Relay(service_name, replica, resp), status_code=resp.status_code, headers=safe_headers)
 
-    print(f"[gateway] Received {resp.status_code} from {target_url} (content-type: {content_type})")
-    if "application/json" in content_type:
-        try:
-            body = resp.json()
-        except Exception:
-            body = resp.text
-        # Truncate large bodies when printing
-        try:
-            body_preview = body if isinstance(body, str) else str(body)
-        except Exception:
-            body_preview = "<unprintable>"
-        print(f"[gateway] Response preview: {body_preview[:400]}")
-        return JSONResponse(status_code=resp.status_code, content=body, headers=safe_headers)
 
-    return Response(content=resp.content, status_code=resp.status_code, headers=safe_headers, media_type=content_type)
+async def forward_cacheable(
+    service_name: str,
+    path: str,
+    request: Request,
+    claims: Dict[str, Any],
+    cache_key: Tuple[str, str, str],
+    ttl: int,
+) -> Response:
+    """Forward a cacheable GET, buffering the (decoded) body so it can be stored and tagged with an ETag."""
+    resp, replica = await _send_upstream(service_name, path, request, claims)
+    try:
+        body = await resp.aread()
+    finally:
+        upstream_clients.end(service_name, replica)
+        await asyncio.shield(resp.aclose())
+
+    entry = response_cache.store(cache_key, resp.status_code, resp.headers, body, ttl)
+    if entry is not None:
+        return response_cache.respond(entry, request)
+    safe_headers = {
+        k: v for k, v in resp.headers.items()
+        if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in ("content-length", "content-encoding")
+    }
+    return Response(content=body, status_code=resp.status_code, headers=safe_headers)
+
 
+def upstream_error(service_name: str, e: Exception) -> HTTPException:
+    """Map a failed upstream call to the gateway's error response."""
+    if isinstance(e, UpstreamUnavailable):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{service_name} service unavailable: {e.reason}",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
+        )
+    if isinstance(e, httpx.TimeoutException):
+        return HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=f"{service_name} service timed out")
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"{service_name} service unavailable: {e}")
 
-async def get_current_user_payload(token: str = Depends(oauth2_scheme)):
-    """Decode JWT and return user payload."""
+
+async def get_current_user_payload(request: Request, token: str = Depends(oauth2_scheme)):
+    """Return the user payload, reusing the auth middleware's verification when it ran."""
+    payload = getattr(request.state, "user", None)
+    if payload is not None:
+        return payload
     try:
-        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        return await verify_token(token)
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
@@ -80,18 +259,36 @@ async def get_current_user_payload(token: str = Depends(oauth2_scheme)):
 async def proxy_create_user(request: Request):
     """Public: Create a new user (no auth required)."""
     try:
-        return await forward_request(SERVICES["users"].rstrip("/") + "/users/", request)
+        return await forward_request("users", "/users/", request)
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"user service unavailable: {e}")
+        raise upstream_error("users", e)
 
 
 @router.api_route("/login/", methods=["POST", "OPTIONS"])
 async def proxy_login(request: Request):
     """Public: Forward login requests to user service."""
     try:
-        return await forward_request(SERVICES["users"].rstrip("/") + "/login/", request)
+        return await forward_request("users", "/login/", request)
+    except Exception as e:
+        raise upstream_error("users", e)
+
+
+@router.api_route("/token/refresh/", methods=["POST", "OPTIONS"])
+async def proxy_refresh(request: Request):
+    """Public: Exchange a refresh token for a new access/refresh token pair."""
+    try:
+        return await forward_request("users", "/token/refresh/", request)
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"user service unavailable: {e}")
+        raise upstream_error("users", e)
+
+
+@router.api_route("/logout/", methods=["POST", "OPTIONS"])
+async def proxy_logout(request: Request):
+    """Public: Revoke a refresh token."""
+    try:
+        return await forward_request("users", "/logout/", request)
+    except Exception as e:
+        raise upstream_error("users", e)
 
 # ---------------------------
 # Protected Routes
@@ -104,7 +301,11 @@ async def gateway_proxy(
     user_payload: dict = Depends(get_current_user_payload),
 ):
     """Generic proxy for all services (requires valid token)."""
+    return await proxy(service_name, path, request, user_payload)
 
+
+async def proxy(service_name: str, path: str, request: Request, user_payload: Dict[str, Any]) -> Response:
+    """Authorize and forward one request to `service_name`; shared by the proxy route and /batch."""
     if service_name not in SERVICES:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Service not found")
 
@@ -112,12 +313,27 @@ async def gateway_proxy(
     if service_name == "parking" and user_payload.get("role") not in ["admin", "superadmin", "user"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions for parking service")
 
-    target_url = SERVICES[service_name].rstrip("/") + ("/" + path if path else "")
+    upstream_path = "/" + path if path else ""
+
+    # Opt-in response cache for idempotent GETs
+    cache_ttl = response_cache.ttl_for(request)
+    cache_key = response_cache.key(request, user_payload.get("role")) if cache_ttl else None
+    if cache_key is not None:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return response_cache.respond(cached, request)
 
     try:
-        return await forward_request(target_url, request)
+        if cache_key is not None:
+            return await forward_cacheable(service_name, upstream_path, request, user_payload, cache_key, cache_ttl)
+        response = await forward_request(service_name, upstream_path, request, claims=user_payload)
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"{service_name} service unavailable: {e}")
+        raise upstream_error(service_name, e)
+
+    # A successful write makes cached reads of its resource, and of the resources it invalidates, stale
+    if request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+        response_cache.purge(request.url.path)
+    return response
 
 # ---------------------------
 # Debug Routes
@@ -127,7 +343,8 @@ async def gateway_proxy(
 async def test_user_service():
     """Debug: Check connectivity to user service."""
     try:
-        resp = await client.get(SERVICES["users"].rstrip("/") + "/")
+        async with upstream_clients.track("users") as (client, base_url):
+            resp = await client.get(base_url + "/")
         return {"status": "success", "user_service": "accessible", "response": resp.text}
     except Exception as e:
         return {"status": "error", "user_service": "unaccessible", "error": str(e)}
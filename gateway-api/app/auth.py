@@ -1,25 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 import httpx
+from app.upstream import upstream_clients
+from app.resilience import UpstreamUnavailable
+from app.api import upstream_error
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-USER_SERVICE_URL = "http://user-services:8000"  # internal Docker service name
-
 @router.post("/login")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Proxy login: forwards username/password to user-service and returns token.
     """
-    async with httpx.AsyncClient() as client:
-        try:
+    # shared keep-alive pool instead of a new client (and TCP handshake) per login
+    try:
+        async with upstream_clients.track("users") as (client, base_url):
             response = await client.post(
-                f"{USER_SERVICE_URL}/login/",
+                f"{base_url}/login/",
                 data={"username": form_data.username, "password": form_data.password},
                 headers={"Content-Type": "application/x-www-form-urlencoded"}
             )
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=500, detail=f"User service unreachable: {e}")
+    except UpstreamUnavailable as e:
+        raise upstream_error("users", e)
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=500, detail=f"User service unreachable: {e}")
 
     # now check status after request is guaranteed to have completed
     if response.status_code >= 400:
@@ -0,0 +1,140 @@
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set
+from app.log import logger
+from app.resilience import UpstreamUnavailable
+
+
+@dataclass
+class Replica:
+    url: str
+    outstanding: int = 0
+    requests: int = 0
+    # consecutive failed calls since the last success
+    failures: int = 0
+    ejected_until: float = 0.0
+    times_ejected: int = 0
+    healthy: Optional[bool] = None
+
+
+# ---------------------------
+# Balancing strategies
+# ---------------------------
+class RoundRobin:
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def choose(self, replicas: Sequence[Replica]) -> Replica:
+        return replicas[next(self._counter) % len(replicas)]
+
+
+class LeastOutstanding:
+    def choose(self, replicas: Sequence[Replica]) -> Replica:
+        fewest = min(r.outstanding for r in replicas)
+        return random.choice([r for r in replicas if r.outstanding == fewest])
+
+
+class PowerOfTwoChoices:
+    """Pick two replicas at random and use the less loaded one."""
+
+    def choose(self, replicas: Sequence[Replica]) -> Replica:
+        if len(replicas) == 1:
+            return replicas[0]
+        a, b = random.sample(list(replicas), 2)
+        return a if a.outstanding <= b.outstanding else b
+
+
+BALANCERS = {
+    "round_robin": RoundRobin,
+    "least_outstanding": LeastOutstanding,
+    "power_of_two": PowerOfTwoChoices,
+}
+
+
+class ReplicaPool:
+    """Replicas of one upstream service behind a balancing strategy.
+
+    A replica that fails `eject_failures` requests in a row is taken out of
+    rotation for `eject_time` seconds; health probes can eject it as well.
+    At most `max_ejected_percent` of the replicas are out at once, and never
+    the last one, so outlier detection alone cannot take a service down.
+    """
+
+    def __init__(self, service: str, urls: List[str], balancer: str, eject_failures: int, eject_time: float,
+                 max_ejected_percent: int = 50):
+        if not urls:
+            raise ValueError(f"No replicas configured for '{service}'")
+        if balancer not in BALANCERS:
+            raise ValueError(f"Unknown balancer '{balancer}' for '{service}', expected one of {sorted(BALANCERS)}")
+        self.service = service
+        self.replicas = [Replica(url=url.rstrip("/")) for url in urls]
+        self.balancer_name = balancer
+        self.balancer = BALANCERS[balancer]()
+        self.eject_failures = eject_failures
+        self.eject_time = eject_time
+        self.max_ejected = min(len(self.replicas) - 1, len(self.replicas) * max_ejected_percent // 100)
+        self.ejections_skipped = 0
+
+    def acquire(self, avoid: Optional[Set[str]] = None) -> Replica:
+        """Pick a replica for one call, preferring ones not in `avoid` (e.g. already tried)."""
+        now = time.monotonic()
+        candidates = [r for r in self.replicas if r.ejected_until <= now]
+        if not candidates:
+            retry_after = min(r.ejected_until for r in self.replicas) - now
+            raise UpstreamUnavailable(self.service, "no healthy replicas", retry_after=retry_after)
+        if avoid:
+            candidates = [r for r in candidates if r.url not in avoid] or candidates
+        replica = self.balancer.choose(candidates)
+        replica.outstanding += 1
+        replica.requests += 1
+        return replica
+
+    def release(self, replica: Replica):
+        replica.outstanding -= 1
+
+    def record(self, replica: Replica, ok: bool):
+        if ok:
+            replica.failures = 0
+            return
+        replica.failures += 1
+        if replica.failures >= self.eject_failures:
+            self.eject(replica, self.eject_time)
+
+    def eject(self, replica: Replica, duration: float):
+        now = time.monotonic()
+        replica.failures = 0
+        if replica.ejected_until <= now:
+            others_out = sum(1 for r in self.replicas if r is not replica and r.ejected_until > now)
+            if others_out >= self.max_ejected:
+                self.ejections_skipped += 1
+                logger.warning("replica ejection skipped, too many replicas out", extra={"fields": {
+                    "service": self.service, "replica": replica.url, "ejected": others_out,
+                }})
+                return
+            replica.times_ejected += 1
+            logger.warning("replica ejected", extra={"fields": {
+                "service": self.service, "replica": replica.url, "seconds": duration,
+            }})
+        replica.ejected_until = max(replica.ejected_until, now + duration)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "balancer": self.balancer_name,
+            "max_ejected": self.max_ejected,
+            "ejections_skipped": self.ejections_skipped,
+            "replicas": [
+                {
+                    "url": r.url,
+                    "outstanding": r.outstanding,
+                    "requests": r.requests,
+                    "consecutive_failures": r.failures,
+                    "ejected": r.ejected_until > now,
+                    "times_ejected": r.times_ejected,
+                    "healthy": r.healthy,
+                }
+                for r in self.replicas
+            ],
+        }
@@ -0,0 +1,135 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Literal, Optional
+from urllib.parse import urlsplit
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import Response
+from jose import JWTError
+from pydantic import BaseModel, Field
+from starlette.requests import Request as StarletteRequest
+from app.api import HOP_BY_HOP_HEADERS, RelayResponse, proxy
+from app.config import settings
+from app.log import logger
+from app.ratelimit import rate_limiter
+from app.tokens import verify_token
+
+router = APIRouter(tags=["batch"])
+
+
+class SubRequest(BaseModel):
+    id: Optional[str] = None
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    # gateway path including the service prefix and any query string, e.g. /parking/slots/?station_id=1
+    path: str
+    # only Authorization is honoured, to act as a different user than the batch caller
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+
+class BatchRequest(BaseModel):
+    requests: List[SubRequest] = Field(min_length=1)
+
+
+def _sub_request(parent: Request, sub: SubRequest, path: str, query: str, authorization: str) -> StarletteRequest:
+    """Build an in-process request for one sub-request, so it goes through the same proxy code as a direct call."""
+    body = b"" if sub.body is None else json.dumps(sub.body).encode()
+    headers = [(b"authorization", authorization.encode())]
+    if sub.body is not None:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": sub.method,
+        "scheme": parent.url.scheme,
+        "server": parent.scope.get("server"),
+        "client": parent.scope.get("client"),
+        "root_path": "",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+    }
+    return StarletteRequest(scope, receive)
+
+
+async def _read_body(response: Response) -> bytes:
+    # decoded: the body is re-serialized into the batch's JSON, where the upstream content-encoding no longer applies
+    if isinstance(response, RelayResponse):
+        return await response.read()
+    return bytes(response.body)
+
+
+def _result(sub_id: str, status_code: int, headers: Dict[str, str], body: Any) -> Dict[str, Any]:
+    return {"id": sub_id, "status": status_code, "headers": headers, "body": body}
+
+
+async def _run(parent: Request, sub: SubRequest, sub_id: str) -> Dict[str, Any]:
+    parts = urlsplit(sub.path)
+    service_name, _, path = parts.path.lstrip("/").partition("/")
+
+    # per-sub-request auth: an own Authorization header is verified on its own,
+    # otherwise the batch caller's (already verified) identity applies
+    authorization = sub.headers.get("Authorization") or sub.headers.get("authorization")
+    if authorization:
+        if not authorization.startswith("Bearer "):
+            return _result(sub_id, status.HTTP_401_UNAUTHORIZED, {}, {"detail": "Missing token"})
+        try:
+            user_payload = await verify_token(authorization.split(" ")[1])
+        except JWTError:
+            return _result(sub_id, status.HTTP_401_UNAUTHORIZED, {}, {"detail": "Invalid token"})
+    else:
+        authorization = parent.headers.get("Authorization", "")
+        user_payload = parent.state.user
+
+    request = _sub_request(parent, sub, "/" + parts.path.lstrip("/"), parts.query, authorization)
+    request.state.user = user_payload
+
+    # each sub-request spends the caller's quota, as it would as a separate call
+    if settings.RATE_LIMIT_ENABLED:
+        wait = await rate_limiter.check(request)
+        if wait is not None:
+            return _result(
+                sub_id, status.HTTP_429_TOO_MANY_REQUESTS,
+                {"retry-after": rate_limiter.retry_after(wait)}, {"detail": "Too many requests"},
+            )
+
+    try:
+        response = await proxy(service_name, path, request, user_payload)
+        raw = await _read_body(response)
+    except HTTPException as e:
+        return _result(sub_id, e.status_code, dict(e.headers or {}), {"detail": e.detail})
+    except Exception as e:
+        logger.exception("batch sub-request failed", extra={"fields": {"path": sub.path}})
+        return _result(sub_id, status.HTTP_500_INTERNAL_SERVER_ERROR, {}, {"detail": str(e)})
+
+    headers = {
+        k: v for k, v in response.headers.items()
+        if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in ("content-length", "content-encoding")
+    }
+    body: Any = None
+    if raw and headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            body = raw.decode("utf-8", errors="replace")
+    elif raw:
+        body = raw.decode("utf-8", errors="replace")
+    return _result(sub_id, response.status_code, headers, body)
+
+
+@router.post("/batch")
+async def batch(payload: BatchRequest, request: Request):
+    """Run several proxied requests concurrently and return all their responses in one body, in request order."""
+    if len(payload.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch may contain at most {settings.BATCH_MAX_REQUESTS} requests",
+        )
+    results = await asyncio.gather(*(
+        _run(request, sub, sub.id or str(index)) for index, sub in enumerate(payload.requests)
+    ))
+    return {"responses": results}
@@ -1,15 +1,114 @@
 from pydantic_settings import BaseSettings
+from typing import Any, Dict, List, Optional, Tuple
 
 #REFRESH_TOKEN_EXPIRATION_TIME = int(os.getenv("REFRESH_TOKEN_EXPIRATION_TIME", 10080))
 class Settings(BaseSettings):
-    SECRET_KEY:str
+    # accepted token algorithms, comma separated, e.g. "RS256" or "RS256,HS256" while migrating;
+    # RS*/ES* tokens are verified with the user service's published keys, HS* with SECRET_KEY
+    SECRET_KEY:Optional[str] = None
     ALGORITHM:str
     ACCESS_TOKEN_EXPIRATION_TIME:int 
 
+    # public keys for verifying tokens, cached by kid; an unknown kid refetches
+    # them early (a key rotation), at most once per JWKS_MIN_REFRESH_INTERVAL
+    JWKS_URL:str = "http://user_services:8000/.well-known/jwks.json"
+    JWKS_CACHE_TTL:float = 300.0
+    JWKS_MIN_REFRESH_INTERVAL:float = 30.0
+    JWKS_TIMEOUT:float = 3.0
+
+    # upstream connection pools (one per service, limits are per replica)
+    UPSTREAM_MAX_CONNECTIONS:int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS:int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY:float = 30.0
+    UPSTREAM_HTTP2:bool = False
+    UPSTREAM_CONNECT_TIMEOUT:float = 3.0
+    UPSTREAM_READ_TIMEOUT:float = 30.0
+    UPSTREAM_WRITE_TIMEOUT:float = 30.0
+    UPSTREAM_POOL_TIMEOUT:float = 5.0
+
+    # replica base URLs per service, overriding the defaults in api.SERVICES, e.g.
+    # UPSTREAM_REPLICAS='{"parking": ["http://parking_services_1:8000", "http://parking_services_2:8000"]}'
+    # balancers: round_robin, least_outstanding, power_of_two
+    UPSTREAM_REPLICAS:Dict[str, List[str]] = {}
+    UPSTREAM_BALANCER:str = "power_of_two"
+    UPSTREAM_BALANCERS:Dict[str, str] = {}
+    UPSTREAM_EJECT_FAILURES:int = 3
+    UPSTREAM_EJECT_TIME:float = 30.0
+    # most replicas of a service out of rotation at once; the last one is never ejected
+    UPSTREAM_MAX_EJECTED_PERCENT:int = 50
+
+    # upstream resilience: breaker, bulkhead, retries and health probes (per service)
+    UPSTREAM_BREAKER_FAILURES:int = 5
+    UPSTREAM_BREAKER_RESET_TIMEOUT:float = 15.0
+    UPSTREAM_MAX_CONCURRENT:int = 50  # per replica
+    UPSTREAM_BULKHEAD_TIMEOUT:float = 0.5
+    UPSTREAM_RETRIES:int = 2
+    UPSTREAM_RETRY_BASE_DELAY:float = 0.05
+    UPSTREAM_RETRY_MAX_DELAY:float = 1.0
+    UPSTREAM_HEALTH_INTERVAL:float = 5.0
+    UPSTREAM_HEALTH_TIMEOUT:float = 1.0
+
+    # structured access logging; route keys are path prefixes, e.g.
+    # LOG_ROUTE_SAMPLE_RATES='{"/parking/bookings/user/dashboard": 0.01}'
+    LOG_LEVEL:str = "INFO"
+    LOG_SAMPLE_RATE:float = 1.0
+    LOG_ROUTE_SAMPLE_RATES:Dict[str, float] = {}
+    LOG_ROUTE_LEVELS:Dict[str, str] = {}
+
+    # verified-token cache shared by the auth middleware and dependencies
+    TOKEN_CACHE_SIZE:int = 10000
+    TOKEN_CACHE_TTL:int = 300
+
+    # HMAC key for the X-Internal-Claims header sent upstream; unset disables it
+    INTERNAL_SIGNING_KEY:Optional[str] = None
+
+    # token-bucket (GCRA) rate limits per user id, or per IP for anonymous requests:
+    # RATE_LIMIT_RATE requests/second sustained with bursts of RATE_LIMIT_BURST;
+    # per-route [rate, burst] by path prefix, e.g.
+    # RATE_LIMIT_ROUTES='{"/parking/bookings/user/dashboard": [0.5, 5]}'
+    RATE_LIMIT_ENABLED:bool = True
+    RATE_LIMIT_RATE:float = 20.0
+    RATE_LIMIT_BURST:int = 40
+    RATE_LIMIT_ROUTES:Dict[str, Tuple[float, int]] = {}
+    RATE_LIMIT_MAX_KEYS:int = 100000
+    # per client IP, checked before the token is verified so floods of missing or
+    # bad tokens are limited too; looser than the per-user quota as users can share an IP
+    RATE_LIMIT_IP_RATE:float = 100.0
+    RATE_LIMIT_IP_BURST:int = 200
+
+    # shared rate-limit buckets across gateway workers; unset keeps them in memory
+    REDIS_URL:Optional[str] = None
+
+    # most sub-requests accepted by one POST /batch
+    BATCH_MAX_REQUESTS:int = 20
+
+    # opt-in GET response cache: path prefix -> TTL seconds, e.g.
+    # RESPONSE_CACHE_ROUTES='{"/parking/stations/": 60, "/parking/slots/": 30}'
+    # only list routes whose responses depend on the caller's role alone
+    RESPONSE_CACHE_ROUTES:Dict[str, int] = {}
+    # a successful write purges its own resource (/<service>/<resource>) plus the
+    # resources listed here: booking flips a slot's status, and slot responses
+    # embed their station
+    RESPONSE_CACHE_INVALIDATES:Dict[str, List[str]] = {
+        "/parking/bookings": ["/parking/slots"],
+        "/parking/stations": ["/parking/slots"],
+    }
+    RESPONSE_CACHE_MAX_ENTRIES:int = 1000
+    RESPONSE_CACHE_MAX_BYTES:int = 1_000_000
+
     model_config = {
         "env_file": ".env",
         "extra": "ignore"
     }
 
 settings = Settings() # type: ignore
+
+
+# per-route settings are keyed by path prefix; the longest matching prefix wins
+def match_route(path: str, per_route: Dict[str, Any], default: Any) -> Any:
+    best: Optional[str] = None
+    for prefix in per_route:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return per_route[best] if best is not None else default
     
\ No newline at end of file
@@ -0,0 +1,103 @@
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict
+from app.config import match_route, settings
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; structured fields come from `extra={"fields": {...}}`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Enqueues records unformatted, exc_info included; the listener thread formats them.
+
+    QueueHandler.prepare() would format on the request path, fold the traceback
+    into the message and drop exc_info, losing the JSON "exc" field.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+# Records are handed to a queue on the request path and written to stdout by a
+# background listener thread, so neither formatting nor a slow stdout blocks the event loop
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_stdout_handler = logging.StreamHandler(sys.stdout)
+_stdout_handler.setFormatter(JsonFormatter())
+_listener = QueueListener(_log_queue, _stdout_handler, respect_handler_level=True)
+
+logger = logging.getLogger("gateway")
+logger.setLevel(settings.LOG_LEVEL.upper())
+logger.addHandler(DeferredQueueHandler(_log_queue))
+logger.propagate = False
+
+
+def start_logging():
+    if _listener._thread is None:  # type: ignore[attr-defined]
+        _listener.start()
+
+def stop_logging():
+    # flushes whatever is still queued
+    if _listener._thread is not None:  # type: ignore[attr-defined]
+        _listener.stop()
+
+
+class AccessLog:
+    """Sampled per-request access log. 5xx responses and upstream failures are never sampled out."""
+
+    def __init__(self, log: logging.Logger):
+        self.log = log
+        self.route_rates = settings.LOG_ROUTE_SAMPLE_RATES
+        self.route_levels = {prefix: logging.getLevelName(level.upper()) for prefix, level in settings.LOG_ROUTE_LEVELS.items()}
+
+    def _level(self, path: str) -> int:
+        return match_route(path, self.route_levels, logging.INFO)
+
+    def _sampled(self, path: str) -> bool:
+        rate = match_route(path, self.route_rates, settings.LOG_SAMPLE_RATE)
+        return rate >= 1.0 or random.random() < rate
+
+    def proxied(self, method: str, path: str, target: str, status_code: int, started: float, **fields: Any):
+        if status_code >= 500:
+            level = logging.WARNING
+        else:
+            level = self._level(path)
+            if not self.log.isEnabledFor(level) or not self._sampled(path):
+                return
+        self.log.log(level, "proxied", extra={"fields": {
+            "method": method,
+            "path": path,
+            "target": target,
+            "status": status_code,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            **fields,
+        }})
+
+    def failed(self, method: str, path: str, target: str, started: float, error: Exception):
+        self.log.warning("upstream request failed", extra={"fields": {
+            "method": method,
+            "path": path,
+            "target": target,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "error": type(error).__name__,
+        }})
+
+
+access_log = AccessLog(logger)
@@ -1,10 +1,14 @@
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
-import httpx
-from jose import jwt, JWTError
-from app import api,auth
+from jose import JWTError
+from app import api,auth,batch
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
+from app.upstream import upstream_clients
+from app.log import start_logging, stop_logging
+from app.tokens import jwks_cache, token_cache, verify_token
+from app.response_cache import response_cache
+from app.ratelimit import rate_limiter
 
 app = FastAPI(title="Parking System Gateway API", version="1.0.0")
 
@@ -30,26 +34,76 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include the API router
+# Include the API router (batch first, the generic proxy route would shadow it)
+app.include_router(batch.router)
 app.include_router(api.router)
 app.include_router(auth.router)
 
-# Middleware: verify JWT once
+@app.on_event("startup")
+async def on_startup():
+    start_logging()
+    upstream_clients.start(api.SERVICES)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await upstream_clients.close()
+    await rate_limiter.backend.close()
+    await jwks_cache.close()
+    stop_logging()
+
+# Routes reachable without a token
+PUBLIC_PATHS = {"/", "/health", "/login/", "/token/refresh/", "/logout/", "/user/users/", "/auth/login", "/docs", "/openapi.json"}
+# Routes never rate limited (liveness checks)
+UNLIMITED_PATHS = {"/", "/health"}
+
+def rate_limited(request: Request) -> bool:
+    return settings.RATE_LIMIT_ENABLED and request.method != "OPTIONS" and request.url.path not in UNLIMITED_PATHS
+
+def too_many_requests(wait: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests"},
+        headers={"Retry-After": rate_limiter.retry_after(wait)},
+    )
+
+# Middleware: route quotas per user (or IP); registered before auth so it runs after auth has set request.state.user
+@app.middleware("http")
+async def rate_limit_middleware(request: Request, call_next):
+    if rate_limited(request):
+        wait = await rate_limiter.check(request)
+        if wait is not None:
+            return too_many_requests(wait)
+    return await call_next(request)
+
+
+# Middleware: verify JWT once (results cached by token hash)
 @app.middleware("http")
 async def auth_middleware(request: Request, call_next):
+    if request.method == "OPTIONS" or request.url.path in PUBLIC_PATHS:
+        return await call_next(request)
+
     token = request.headers.get("Authorization")
     if not token or not token.startswith("Bearer "):
         return JSONResponse(status_code=401, content={"detail": "Missing token"})
 
     token = token.split(" ")[1]
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        request.state.user = payload
+        request.state.user = await verify_token(token)
     except JWTError:
         return JSONResponse(status_code=401, content={"detail": "Invalid token"})
 
     return await call_next(request)
 
+# Middleware: per-IP quota; registered last so it runs first, before any token is
+# verified, and requests with missing or bad tokens are limited too
+@app.middleware("http")
+async def ip_rate_limit_middleware(request: Request, call_next):
+    if rate_limited(request):
+        wait = await rate_limiter.check_ip(request)
+        if wait is not None:
+            return too_many_requests(wait)
+    return await call_next(request)
+
 @app.get("/")
 async def root():
     return {
@@ -63,5 +117,15 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "gateway"}
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "upstreams": upstream_clients.stats(),
+        "token_cache": token_cache.stats(),
+        "jwks": jwks_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "rate_limit": rate_limiter.stats(),
+    }
+
 
 
@@ -0,0 +1,173 @@
+import math
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from fastapi import Request
+from app.config import match_route, settings
+from app.log import logger
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis is optional, the in-memory backend is used without it
+    redis = None
+
+
+class Quota(NamedTuple):
+    rate: float  # sustained requests per second
+    burst: int  # requests allowed back to back
+
+
+# ---------------------------
+# GCRA backends
+# ---------------------------
+# Both backends implement the generic cell rate algorithm: a key stores its
+# theoretical arrival time (TAT), a request is allowed while the TAT is at
+# most (burst - 1) emission intervals ahead of now, and each allowed request
+# pushes the TAT one interval further. hit() returns 0 when the request is
+# allowed, otherwise the seconds to wait.
+class MemoryRateLimitBackend:
+    """Per-process buckets; limits are per gateway worker."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._tat: Dict[str, float] = {}
+
+    async def hit(self, key: str, quota: Quota) -> float:
+        now = time.monotonic()
+        interval = 1.0 / quota.rate
+        tat = max(self._tat.get(key, now), now)
+        wait = tat - now - (quota.burst - 1) * interval
+        if wait > 0:
+            return wait
+        if len(self._tat) >= self.max_keys and key not in self._tat:
+            self._prune(now)
+        self._tat[key] = tat + interval
+        return 0.0
+
+    def _prune(self, now: float):
+        # keys whose TAT has passed are equivalent to a full bucket
+        self._tat = {key: tat for key, tat in self._tat.items() if tat > now}
+
+    async def close(self):
+        self._tat.clear()
+
+
+# GCRA in one round trip; uses the Redis clock so every gateway replica agrees
+_GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local wait = tat - now - (burst - 1) * interval
+if wait > 0 then return wait end
+redis.call('SET', KEYS[1], tat + interval, 'PX', math.ceil(tat + interval - now))
+return 0
+"""
+
+
+class RedisRateLimitBackend:
+    """Buckets shared by every gateway worker and replica."""
+
+    def __init__(self, url: str):
+        self._client = redis.from_url(url)  # type: ignore[union-attr]
+        self._script = self._client.register_script(_GCRA_SCRIPT)
+
+    async def hit(self, key: str, quota: Quota) -> float:
+        interval_ms = max(1, round(1000 / quota.rate))
+        wait_ms = await self._script(keys=[key], args=[interval_ms, quota.burst])
+        return int(wait_ms) / 1000
+
+    async def close(self):
+        await self._client.aclose()
+
+
+# ---------------------------
+# Limiter
+# ---------------------------
+class RateLimiter:
+    """Per-route quotas keyed by the caller's user id, or by client IP for anonymous requests.
+
+    `check_ip` applies one per-IP quota to every request and runs before
+    authentication; `check` applies the route quotas once the caller is known.
+    A failing backend lets requests through rather than taking the gateway down with it.
+    """
+
+    def __init__(self, backend, default: Quota, routes: Dict[str, Quota], ip_quota: Quota, prefix: str = "ratelimit"):
+        self.backend = backend
+        self.default = default
+        self.routes = routes
+        self.ip_quota = ip_quota
+        # prefix -> (prefix, quota), so one lookup yields the bucket scope too
+        self._scoped = {route: (route, quota) for route, quota in routes.items()}
+        self.prefix = prefix
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+        self._failing = False
+
+    @staticmethod
+    def client_ip(request: Request) -> str:
+        return request.client.host if request.client else "unknown"
+
+    def identity(self, request: Request) -> str:
+        user = getattr(request.state, "user", None)
+        if user and user.get("id") is not None:
+            return f"user:{user['id']}"
+        return f"ip:{self.client_ip(request)}"
+
+    def quota_for(self, path: str) -> Tuple[str, Quota]:
+        return match_route(path, self._scoped, ("*", self.default))
+
+    async def check(self, request: Request) -> Optional[float]:
+        """Count the request; returns seconds until it would be allowed, or None when it is."""
+        scope, quota = self.quota_for(request.url.path)
+        return await self._hit(f"{self.prefix}:{scope}:{self.identity(request)}", quota)
+
+    async def check_ip(self, request: Request) -> Optional[float]:
+        """Like check, against the client IP's quota for all routes; needs no authentication."""
+        return await self._hit(f"{self.prefix}:ip:{self.client_ip(request)}", self.ip_quota)
+
+    async def _hit(self, key: str, quota: Quota) -> Optional[float]:
+        try:
+            wait = await self.backend.hit(key, quota)
+        except Exception as e:
+            self.errors += 1
+            if not self._failing:
+                logger.warning("rate limit backend failing, allowing requests", extra={"fields": {"error": str(e)}})
+                self._failing = True
+            return None
+        self._failing = False
+        if wait > 0:
+            self.limited += 1
+            return wait
+        self.allowed += 1
+        return None
+
+    @staticmethod
+    def retry_after(wait: float) -> str:
+        return str(max(1, math.ceil(wait)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "errors": self.errors,
+        }
+
+
+def _make_backend():
+    if settings.REDIS_URL:
+        if redis is not None:
+            return RedisRateLimitBackend(settings.REDIS_URL)
+        logger.warning("REDIS_URL is set but the redis package is not installed, using in-memory rate limits")
+    return MemoryRateLimitBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+rate_limiter = RateLimiter(
+    backend=_make_backend(),
+    default=Quota(settings.RATE_LIMIT_RATE, settings.RATE_LIMIT_BURST),
+    routes={prefix: Quota(*quota) for prefix, quota in settings.RATE_LIMIT_ROUTES.items()},
+    ip_quota=Quota(settings.RATE_LIMIT_IP_RATE, settings.RATE_LIMIT_IP_BURST),
+)
@@ -0,0 +1,199 @@
+import asyncio
+import random
+import time
+from typing import TYPE_CHECKING, Any, Dict
+import httpx
+from app.config import settings
+from app.log import logger
+
+if TYPE_CHECKING:
+    from app.balancer import ReplicaPool
+
+# methods that are safe to replay against an upstream (when they carry no body)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# upstream statuses that count as a failure and may be retried
+RETRYABLE_STATUSES = {502, 503, 504}
+# transport errors raised before the request reached the upstream; a read
+# timeout is not one of them, retrying it would stack up full READ_TIMEOUTs
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream that is known to be failing or saturated."""
+
+    def __init__(self, service: str, reason: str, retry_after: float = 1.0):
+        super().__init__(f"{service} {reason}")
+        self.service = service
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Classic closed / open / half-open breaker.
+
+    Opens after `failure_threshold` consecutive failures, rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through; its
+    outcome closes the breaker or opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, service: str, failure_threshold: int, reset_timeout: float):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self):
+        """Raise UpstreamUnavailable unless a call may go through now."""
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.service, "circuit open", retry_after=remaining)
+            self.state = self.HALF_OPEN
+            logger.info("circuit half-open", extra={"fields": {"service": self.service}})
+        if self.state == self.HALF_OPEN:
+            if self.trial_in_flight:
+                self.rejected += 1
+                raise UpstreamUnavailable(self.service, "circuit half-open", retry_after=1.0)
+            self.trial_in_flight = True
+
+    def record_success(self):
+        # calls admitted before the breaker opened don't decide anything; only the half-open trial does
+        if self.state == self.OPEN:
+            return
+        if self.state != self.CLOSED:
+            logger.info("circuit closed", extra={"fields": {"service": self.service}})
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def cancel_trial(self):
+        """Hand back a half-open trial slot for a call that ended without an outcome (never sent, or cancelled)."""
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        # late failures from calls admitted before the breaker opened must not push the reset back
+        if self.state == self.OPEN:
+            return
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self):
+        if self.state != self.OPEN:
+            self.times_opened += 1
+            logger.warning("circuit open", extra={"fields": {"service": self.service, "failures": self.failures}})
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class Bulkhead:
+    """Caps concurrent calls to one upstream so a slow service cannot hold every gateway worker."""
+
+    def __init__(self, service: str, max_concurrent: int, max_wait: float):
+        self.service = service
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        try:
+            self.waiting += 1
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise UpstreamUnavailable(self.service, "bulkhead full", retry_after=1.0)
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            # Semaphore._value is the number of free permits
+            "active": self.max_concurrent - self._semaphore._value,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for retry number `attempt` (1-based)."""
+    cap = min(settings.UPSTREAM_RETRY_MAX_DELAY, settings.UPSTREAM_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(0, cap)
+
+
+def is_retryable(method: str, has_body: bool) -> bool:
+    # a streamed request body cannot be replayed
+    return method in IDEMPOTENT_METHODS and not has_body
+
+
+class HealthProber:
+    """Polls the root endpoint of every replica of each upstream.
+
+    A replica that fails its probe is ejected from its pool until it passes
+    again, so traffic moves away before user requests time out; a passing
+    probe while the service's breaker is open lets the next request through
+    as its half-open trial instead of waiting out the reset timeout.
+    """
+
+    def __init__(self, interval: float, timeout: float):
+        self.interval = interval
+        self.timeout = timeout
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, service: str, pool: "ReplicaPool", client: httpx.AsyncClient, breaker: CircuitBreaker):
+        if service in self._tasks or self.interval <= 0:
+            return
+        self._tasks[service] = asyncio.get_running_loop().create_task(self._run(pool, client, breaker))
+
+    async def _probe(self, client: httpx.AsyncClient, url: str) -> bool:
+        try:
+            resp = await client.get(url + "/", timeout=self.timeout)
+            return resp.status_code < 500
+        except httpx.HTTPError:
+            return False
+
+    async def _run(self, pool: "ReplicaPool", client: httpx.AsyncClient, breaker: CircuitBreaker):
+        while True:
+            await asyncio.sleep(self.interval)
+            results = await asyncio.gather(*(self._probe(client, r.url) for r in pool.replicas))
+            for replica, healthy in zip(pool.replicas, results):
+                if healthy != replica.healthy:
+                    logger.info("upstream health changed", extra={"fields": {
+                        "service": pool.service, "replica": replica.url, "healthy": healthy,
+                    }})
+                if not healthy:
+                    # stays out until a later probe passes
+                    pool.eject(replica, self.interval * 2)
+                elif replica.healthy is False:
+                    replica.ejected_until = 0.0
+                replica.healthy = healthy
+            if any(results) and breaker.state == CircuitBreaker.OPEN:
+                breaker.opened_at = 0.0
+
+    async def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,111 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+from app.config import match_route, settings
+
+# upstream headers that describe the original transfer, not the cached body
+_UNCACHED_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection", "date", "etag"}
+
+
+class CachedResponse:
+    def __init__(self, status_code: int, headers: Dict[str, str], body: bytes, ttl: int):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.expires_at = time.monotonic() + ttl
+
+
+class ResponseCache:
+    """Opt-in cache of upstream GET responses, keyed by path, query and caller role."""
+
+    def __init__(self, routes: Dict[str, int], max_entries: int, max_bytes: int,
+                 invalidates: Optional[Dict[str, List[str]]] = None):
+        self.routes = routes
+        # resource prefix -> other resource prefixes a write to it makes stale
+        self.invalidates = {
+            prefix.rstrip("/"): [other.rstrip("/") for other in others]
+            for prefix, others in (invalidates or {}).items()
+        }
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str, str], CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.purged = 0
+
+    def ttl_for(self, request: Request) -> int:
+        if request.method != "GET":
+            return 0
+        return match_route(request.url.path, self.routes, 0)
+
+    @staticmethod
+    def key(request: Request, role: Optional[str]) -> Tuple[str, str, str]:
+        query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        return (request.url.path, query, role or "")
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def store(self, key: Tuple[str, str, str], status_code: int, headers: Any, body: bytes, ttl: int) -> Optional[CachedResponse]:
+        """Cache a successful response; returns None when it is not cacheable."""
+        if status_code != 200 or len(body) > self.max_bytes or "no-store" in headers.get("cache-control", ""):
+            return None
+        entry = CachedResponse(
+            status_code,
+            {k: v for k, v in headers.items() if k.lower() not in _UNCACHED_HEADERS},
+            body,
+            ttl,
+        )
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def purge(self, path: str):
+        """Drop cached responses under the resource prefix of `path` (/<service>/<resource>) and the resources it invalidates."""
+        prefix = "/" + "/".join(path.strip("/").split("/")[:2])
+        prefixes = [prefix, *self.invalidates.get(prefix, ())]
+        stale = [
+            key for key in self._entries
+            if any(key[0] == p or key[0].startswith(p + "/") for p in prefixes)
+        ]
+        for key in stale:
+            del self._entries[key]
+        self.purged += len(stale)
+
+    def respond(self, entry: CachedResponse, request: Request) -> Response:
+        if_none_match = request.headers.get("if-none-match", "")
+        if entry.etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+            self.not_modified += 1
+            return Response(status_code=304, headers={"ETag": entry.etag})
+        return Response(content=entry.body, status_code=entry.status_code, headers={**entry.headers, "ETag": entry.etag})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "purged": self.purged,
+        }
+
+
+response_cache = ResponseCache(
+    routes=settings.RESPONSE_CACHE_ROUTES,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    invalidates=settings.RESPONSE_CACHE_INVALIDATES,
+)
@@ -0,0 +1,178 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from jose import jwk, jwt, JWTError
+from jose.exceptions import JWKError
+from app.config import settings
+from app.log import logger
+
+# header carrying gateway-verified claims to upstream services
+INTERNAL_CLAIMS_HEADER = "x-internal-claims"
+
+
+class TokenCache:
+    """Bounded LRU of verified token payloads, keyed by token hash.
+
+    An entry lives until the token's own `exp` or `ttl` seconds, whichever comes first.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def set(self, token: str, payload: Dict[str, Any]):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+        key = self._key(token)
+        self._entries[key] = (expires_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache(max_size=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+
+class JWKSCache:
+    """Public verification keys from the issuer's JWKS, looked up by `kid`.
+
+    The set is refetched once it is `ttl` seconds old, or early when a token
+    names a kid it does not contain yet (the issuer rotated its key), but no
+    more than once per `min_refresh` seconds so garbage kids cannot hammer the
+    issuer. Concurrent misses share one fetch; if it fails the old keys stay.
+    """
+
+    def __init__(self, url: str, ttl: float, min_refresh: float, timeout: float):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self.timeout = timeout
+        self._keys: Dict[str, Any] = {}
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+        self.fetches = 0
+        self.errors = 0
+
+    def _due(self, kid: str) -> bool:
+        age = time.monotonic() - self._checked_at
+        return age >= (self.ttl if kid in self._keys else self.min_refresh)
+
+    async def _refresh(self, kid: str):
+        async with self._lock:
+            if not self._due(kid):  # another request refreshed while this one waited
+                return
+            self._checked_at = time.monotonic()
+            if self._client is None:
+                self._client = httpx.AsyncClient(timeout=self.timeout)
+            try:
+                response = await self._client.get(self.url)
+                response.raise_for_status()
+                self._keys = self._parse(response.json().get("keys", []))
+                self.fetches += 1
+            except (httpx.HTTPError, ValueError, AttributeError) as e:
+                self.errors += 1
+                logger.warning("jwks fetch failed, keeping cached keys", extra={"fields": {"url": self.url, "error": str(e)}})
+
+    @staticmethod
+    def _parse(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        keys = {}
+        for entry in entries:
+            if "kid" not in entry or entry.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[entry["kid"]] = jwk.construct(entry, entry.get("alg"))
+            except JWKError:
+                continue
+        return keys
+
+    async def get(self, kid: Optional[str]) -> Any:
+        if not kid:
+            raise JWTError("Token has no key id")
+        if self._due(kid):
+            await self._refresh(kid)
+        key = self._keys.get(kid)
+        if key is None:
+            raise JWTError("Unknown signing key")
+        return key
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"keys": sorted(self._keys), "fetches": self.fetches, "errors": self.errors}
+
+
+jwks_cache = JWKSCache(
+    url=settings.JWKS_URL,
+    ttl=settings.JWKS_CACHE_TTL,
+    min_refresh=settings.JWKS_MIN_REFRESH_INTERVAL,
+    timeout=settings.JWKS_TIMEOUT,
+)
+
+ACCEPTED_ALGORITHMS = [alg.strip() for alg in settings.ALGORITHM.split(",") if alg.strip()]
+
+
+async def verify_token(token: str) -> Dict[str, Any]:
+    """Return the token's claims, decoding it only on a cache miss. Raises JWTError if invalid."""
+    payload = token_cache.get(token)
+    if payload is None:
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
+        # the header only picks among accepted algorithms, it never widens them
+        if algorithm not in ACCEPTED_ALGORITHMS:
+            raise JWTError("Unsupported token algorithm")
+        if algorithm.startswith("HS"):
+            if not settings.SECRET_KEY:
+                raise JWTError("Shared-secret tokens are not accepted")
+            key = settings.SECRET_KEY
+        else:
+            key = await jwks_cache.get(header.get("kid"))
+        payload = jwt.decode(token, key, algorithms=[algorithm])
+        token_cache.set(token, payload)
+    return payload
+
+
+def sign_claims(claims: Dict[str, Any]) -> Optional[str]:
+    """Encode claims as `<base64url json>.<hex hmac-sha256>` for upstreams, or None when signing is off."""
+    if not settings.INTERNAL_SIGNING_KEY:
+        return None
+    body = base64.urlsafe_b64encode(json.dumps(claims, separators=(",", ":"), default=str).encode()).decode()
+    signature = hmac.new(settings.INTERNAL_SIGNING_KEY.encode(), body.encode(), hashlib.sha256).hexdigest()
+    return f"{body}.{signature}"
@@ -0,0 +1,191 @@
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import httpx
+from app.config import settings
+from app.log import logger
+from app.resilience import Bulkhead, CircuitBreaker, HealthProber
+from app.balancer import Replica, ReplicaPool
+
+
+class UpstreamClients:
+    """One pooled AsyncClient per upstream service, opened on startup and closed on shutdown.
+
+    Each service also gets a pool of replicas behind a balancer, a circuit
+    breaker, a bulkhead and health probes. Connection and concurrency limits
+    are per replica, so adding replicas adds capacity.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.bulkheads: Dict[str, Bulkhead] = {}
+        self.pools: Dict[str, ReplicaPool] = {}
+        self.prober = HealthProber(
+            interval=settings.UPSTREAM_HEALTH_INTERVAL,
+            timeout=settings.UPSTREAM_HEALTH_TIMEOUT,
+        )
+        self._in_flight: Dict[str, int] = {}
+        self._peak_in_flight: Dict[str, int] = {}
+        self._requests: Dict[str, int] = {}
+
+    def start(self, services: Dict[str, List[str]]):
+        http2 = settings.UPSTREAM_HTTP2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("UPSTREAM_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+            http2 = False
+        for name, urls in services.items():
+            if name in self._clients:
+                continue
+            pool = ReplicaPool(
+                name,
+                urls,
+                balancer=settings.UPSTREAM_BALANCERS.get(name, settings.UPSTREAM_BALANCER),
+                eject_failures=settings.UPSTREAM_EJECT_FAILURES,
+                eject_time=settings.UPSTREAM_EJECT_TIME,
+                max_ejected_percent=settings.UPSTREAM_MAX_EJECTED_PERCENT,
+            )
+            replicas = len(pool.replicas)
+            self.pools[name] = pool
+            # one client serves every replica; httpx keeps a connection pool per origin
+            self._clients[name] = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=settings.UPSTREAM_MAX_CONNECTIONS * replicas,
+                    max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS * replicas,
+                    keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+                    read=settings.UPSTREAM_READ_TIMEOUT,
+                    write=settings.UPSTREAM_WRITE_TIMEOUT,
+                    pool=settings.UPSTREAM_POOL_TIMEOUT,
+                ),
+            )
+            self._in_flight[name] = 0
+            self._peak_in_flight[name] = 0
+            self._requests[name] = 0
+            self.breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=settings.UPSTREAM_BREAKER_FAILURES,
+                reset_timeout=settings.UPSTREAM_BREAKER_RESET_TIMEOUT,
+            )
+            self.bulkheads[name] = Bulkhead(
+                name,
+                max_concurrent=settings.UPSTREAM_MAX_CONCURRENT * replicas,
+                max_wait=settings.UPSTREAM_BULKHEAD_TIMEOUT,
+            )
+            self.prober.start(name, pool, self._clients[name], self.breakers[name])
+
+    async def close(self):
+        await self.prober.stop()
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def get(self, service: str) -> httpx.AsyncClient:
+        client = self._clients.get(service)
+        if client is None:
+            raise RuntimeError(f"No upstream client for '{service}', was start() called?")
+        return client
+
+    async def begin(
+        self, service: str, avoid: Optional[Set[str]] = None, admitted: bool = False,
+    ) -> Tuple[httpx.AsyncClient, Replica]:
+        """Admit a request to `service` and pick the replica to send it to.
+
+        Pair with end() once its response is consumed. Raises UpstreamUnavailable
+        when the breaker is open, the bulkhead stays full or every replica is ejected.
+        Retries pass `admitted`: the breaker admits client requests, not attempts.
+        """
+        client = self.get(service)
+        breaker = self.breakers[service]
+        if not admitted:
+            breaker.allow()
+        try:
+            await self.bulkheads[service].acquire()
+        except BaseException:
+            # give a half-open trial slot back, nothing was sent
+            if not admitted:
+                breaker.cancel_trial()
+            raise
+        try:
+            replica = self.pools[service].acquire(avoid)
+        except BaseException:
+            self.bulkheads[service].release()
+            if not admitted:
+                breaker.cancel_trial()
+            raise
+        self._requests[service] += 1
+        self._in_flight[service] += 1
+        self._peak_in_flight[service] = max(self._peak_in_flight[service], self._in_flight[service])
+        return client, replica
+
+    def end(self, service: str, replica: Replica):
+        self._in_flight[service] -= 1
+        self.bulkheads[service].release()
+        self.pools[service].release(replica)
+
+    def abandon(self, service: str, replica: Replica):
+        """end() for a call that was cancelled before its outcome was recorded; it counts as neither success nor failure."""
+        self.end(service, replica)
+        self.breakers[service].cancel_trial()
+
+    def record(self, service: str, replica: Replica, ok: bool):
+        """Feed the outcome of a single-attempt call into the breaker and pool."""
+        self.settle(service, [(replica, ok)], ok)
+
+    def settle(self, service: str, outcomes: Iterable[Tuple[Replica, bool]], ok: bool):
+        """Record a finished client request once, however many attempts it took.
+
+        `outcomes` holds one (replica, ok) per replica tried, `ok` is the request's
+        final outcome for the breaker. Only transport errors and 502/503/504 are
+        failures; an application 500 says nothing about the replica's health.
+        """
+        for replica, replica_ok in outcomes:
+            self.pools[service].record(replica, replica_ok)
+        if ok:
+            self.breakers[service].record_success()
+        else:
+            self.breakers[service].record_failure()
+
+    @asynccontextmanager
+    async def track(self, service: str):
+        """Count a request against `service` while it is in flight; yields the client and the replica base URL."""
+        client, replica = await self.begin(service)
+        try:
+            yield client, replica.url
+        except httpx.TransportError:
+            self.record(service, replica, False)
+            self.end(service, replica)
+            raise
+        except BaseException:
+            # cancelled or failed for a reason that says nothing about the upstream
+            self.abandon(service, replica)
+            raise
+        else:
+            self.record(service, replica, True)
+            self.end(service, replica)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {}
+        for name, client in self._clients.items():
+            # httpcore pool internals; best effort, they are not public API
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+            stats[name] = {
+                "requests": self._requests[name],
+                "in_flight": self._in_flight[name],
+                "peak_in_flight": self._peak_in_flight[name],
+                "max_connections": settings.UPSTREAM_MAX_CONNECTIONS * len(self.pools[name].replicas),
+                "open_connections": len(connections),
+                "idle_connections": sum(1 for conn in connections if conn.is_idle()),
+                "queued_requests": sum(1 for req in getattr(pool, "_requests", []) if req.connection is None),
+                "breaker": self.breakers[name].stats(),
+                "bulkhead": self.bulkheads[name].stats(),
+                **self.pools[name].stats(),
+            }
+        return stats
+
+
+upstream_clients = UpstreamClients()
@@ -0,0 +1,109 @@
+"""Per-request overhead of the GCRA rate limiter, against a 100µs budget.
+
+Times RateLimiter.check_ip() and check() together, as the two rate-limit
+middlewares call them for every request, for a few key patterns.
+The pruning workload's mean includes the memory backend's amortised sweep of
+expired buckets once it reaches RATE_LIMIT_MAX_KEYS.
+It always runs the in-memory backend. The Redis backend runs too when
+REDIS_URL is set and the redis package is installed; that figure is mostly
+one network round trip to Redis. Exits non-zero if a p99 is over budget.
+
+    python scripts/bench_ratelimit.py
+    REDIS_URL=redis://localhost:6379/0 python scripts/bench_ratelimit.py
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# app.config needs these at import time
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRATION_TIME", "30")
+
+from starlette.requests import Request  # noqa: E402
+from app.ratelimit import MemoryRateLimitBackend, Quota, RateLimiter, RedisRateLimitBackend, redis  # noqa: E402
+
+BUDGET_US = 100.0
+
+
+def make_request(path: str, user_id=None, ip: str = "10.0.0.1") -> Request:
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": [], "client": (ip, 0)}
+    request = Request(scope)
+    if user_id is not None:
+        request.state.user = {"id": user_id}
+    return request
+
+
+def workloads(keys: int):
+    """name -> (requests to cycle through, max_keys); requests are built up front so only the checks are timed."""
+    users = [make_request("/parking/stations", user_id=n) for n in range(keys)]
+    return {
+        # one caller well under its quota
+        "hot key, allowed": ([make_request("/parking/stations", user_id=1)], keys),
+        # many callers, so the backend holds `keys` buckets
+        f"{keys} users": (users, keys * 2),
+        # anonymous callers on a route with its own quota (an IP bucket and a route bucket each)
+        f"{keys} IPs, route quota": ([
+            make_request("/users/login", ip=f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}") for n in range(keys)
+        ], keys * 3),
+        # more callers than RATE_LIMIT_MAX_KEYS: the memory backend prunes every keys/10 new callers
+        f"{keys} users, pruning": (users, keys // 10),
+        # one caller far over its quota, every check is rejected
+        "hot key, limited": ([make_request("/users/login", user_id=2)], keys),
+    }
+
+
+async def measure(limiter: RateLimiter, requests, checks: int):
+    for request in requests[:1000]:  # warm up
+        await limiter.check_ip(request)
+        await limiter.check(request)
+    samples = []
+    for i in range(checks):
+        request = requests[i % len(requests)]
+        started = time.perf_counter()
+        await limiter.check_ip(request)
+        await limiter.check(request)
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    samples.sort()
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+async def main(args) -> int:
+    backends = {"memory": lambda max_keys: MemoryRateLimitBackend(max_keys=max_keys)}
+    redis_url = os.environ.get("REDIS_URL")
+    if redis_url and redis is not None:
+        backends["redis"] = lambda max_keys: RedisRateLimitBackend(redis_url)
+    else:
+        print("REDIS_URL is not set or redis is not installed, skipping the Redis backend\n")
+
+    over_budget = False
+    print(f"{'backend':>8} {'workload':>24} {'mean µs':>9} {'p50 µs':>8} {'p99 µs':>8}")
+    for name, make_backend in backends.items():
+        for workload, (requests, max_keys) in workloads(args.keys).items():
+            backend = make_backend(max_keys)
+            # a fresh prefix per run, so Redis buckets left by earlier runs do not count
+            limiter = RateLimiter(
+                backend, default=Quota(1_000_000, 1_000_000), routes={"/users/login": Quota(1, 5)},
+                ip_quota=Quota(1_000_000, 1_000_000), prefix=f"bench:{uuid.uuid4().hex[:8]}",
+            )
+            mean, p50, p99 = await measure(limiter, requests, args.checks)
+            await backend.close()
+            if limiter.errors:
+                raise SystemExit(f"{name} backend failed {limiter.errors} checks")
+            over_budget |= p99 > BUDGET_US
+            flag = "" if p99 <= BUDGET_US else "  over budget"
+            print(f"{name:>8} {workload:>24} {mean:>9.1f} {p50:>8.1f} {p99:>8.1f}{flag}")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=200_000, help="timed checks per workload")
+    parser.add_argument("--keys", type=int, default=100_000, help="distinct callers in the many-key workloads")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,7 @@
+import os
+
+# the gateway reads these at import time
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRATION_TIME", "30")
+os.environ.setdefault("UPSTREAM_HEALTH_INTERVAL", "0")
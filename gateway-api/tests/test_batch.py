@@ -0,0 +1,29 @@
+import asyncio
+import gzip
+import json
+import httpx
+from app import batch
+from tests.test_upstream_cancellation import get_request
+from tests.test_upstream_outcomes import make_clients
+
+
+def test_encoded_upstream_bodies_are_decoded(monkeypatch):
+    slots = [{"id": 1, "slot_number": "A1"}]
+
+    async def gzipped(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={"content-type": "application/json", "content-encoding": "gzip"},
+            content=gzip.compress(json.dumps(slots).encode()),
+        )
+
+    clients = make_clients(monkeypatch, ["http://a"], gzipped)
+    parent = get_request("/batch")
+    parent.state.user = {"id": 1, "role": "user"}
+
+    result = asyncio.run(batch._run(parent, batch.SubRequest(path="/parking/slots/"), "slots"))
+
+    assert result["status"] == 200
+    assert result["body"] == slots
+    assert "content-encoding" not in {k.lower() for k in result["headers"]}
+    assert clients.stats()["parking"]["in_flight"] == 0
@@ -0,0 +1,32 @@
+import io
+import json
+import threading
+from app import log
+
+
+def test_exceptions_keep_their_traceback_and_are_formatted_off_the_request_path(monkeypatch):
+    stream = io.StringIO()
+    monkeypatch.setattr(log._stdout_handler, "stream", stream)
+    formatted_on = []
+    format_record = log.JsonFormatter.format
+
+    def spy(self, record):
+        formatted_on.append(threading.current_thread())
+        return format_record(self, record)
+
+    monkeypatch.setattr(log.JsonFormatter, "format", spy)
+    log.start_logging()
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            log.logger.exception("upstream %s failed", "parking", extra={"fields": {"path": "/parking/slots/"}})
+    finally:
+        log.stop_logging()
+
+    # records logged by earlier tests wait in the queue for the listener too
+    entry = next(e for e in map(json.loads, stream.getvalue().splitlines()) if e["msg"].startswith("upstream"))
+    assert entry["msg"] == "upstream parking failed"
+    assert entry["path"] == "/parking/slots/"
+    assert "ZeroDivisionError" in entry["exc"]
+    assert formatted_on and threading.main_thread() not in formatted_on
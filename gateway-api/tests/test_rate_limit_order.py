@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+from app import main
+from app.ratelimit import MemoryRateLimitBackend, Quota
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main.rate_limiter, "backend", MemoryRateLimitBackend(max_keys=1000))
+    monkeypatch.setattr(main.rate_limiter, "ip_quota", Quota(0.001, 3))
+    # no `with`: startup would open upstream clients the test never uses
+    return TestClient(main.app)
+
+
+def test_requests_without_a_token_are_limited_before_auth(client):
+    statuses = [client.get("/parking/slots/").status_code for _ in range(5)]
+    assert statuses == [401, 401, 401, 429, 429]
+
+
+def test_bad_tokens_are_limited_before_they_are_verified(client, monkeypatch):
+    verified = []
+
+    async def verify_token(token):
+        verified.append(token)
+        raise main.JWTError("bad token")
+
+    monkeypatch.setattr(main, "verify_token", verify_token)
+    statuses = [client.get("/parking/slots/", headers={"Authorization": f"Bearer t{n}"}).status_code for n in range(5)]
+    assert statuses == [401, 401, 401, 429, 429]
+    assert len(verified) == 3
+
+
+def test_liveness_checks_are_not_limited(client):
+    assert {client.get("/health").status_code for _ in range(5)} == {200}
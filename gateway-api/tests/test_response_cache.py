@@ -0,0 +1,48 @@
+import pytest
+from starlette.requests import Request
+from app.response_cache import ResponseCache
+
+
+def get_request(path: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(
+        routes={"/parking/": 60},
+        max_entries=100,
+        max_bytes=10_000,
+        invalidates={"/parking/bookings": ["/parking/slots/"], "/parking/stations": ["/parking/slots"]},
+    )
+
+
+def fill(cache, *paths):
+    keys = {}
+    for path in paths:
+        keys[path] = cache.key(get_request(path), "user")
+        cache.store(keys[path], 200, {}, b"{}", ttl=60)
+    return keys
+
+
+def cached(cache, keys):
+    return {path for path, key in keys.items() if cache.get(key) is not None}
+
+
+def test_booking_write_purges_slots(cache):
+    keys = fill(cache, "/parking/bookings/history", "/parking/slots/availability", "/parking/slots/7", "/parking/stations/")
+    cache.purge("/parking/bookings/")
+    assert cached(cache, keys) == {"/parking/stations/"}
+    assert cache.purged == 3
+
+
+def test_station_write_purges_slots_that_embed_it(cache):
+    keys = fill(cache, "/parking/stations/3", "/parking/slots/7", "/parking/bookings/history")
+    cache.purge("/parking/stations/3")
+    assert cached(cache, keys) == {"/parking/bookings/history"}
+
+
+def test_unmapped_write_purges_only_its_resource(cache):
+    keys = fill(cache, "/parking/slots/7", "/parking/slotsx/1", "/parking/stations/", "/parking/bookings/history")
+    cache.purge("/parking/slots/")
+    assert cached(cache, keys) == {"/parking/slotsx/1", "/parking/stations/", "/parking/bookings/history"}
@@ -0,0 +1,110 @@
+import asyncio
+import httpx
+import pytest
+from starlette.requests import Request
+from app import api
+from app.config import settings
+from app.upstream import UpstreamClients
+
+
+def get_request(path: str) -> Request:
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "headers": [],
+        "server": ("gateway", 8000), "client": ("127.0.0.1", 1234), "root_path": "",
+    }
+    return Request(scope)
+
+
+async def slow_upstream(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(10)
+    return httpx.Response(200)
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_CONCURRENT", 2)
+    monkeypatch.setattr(settings, "UPSTREAM_BULKHEAD_TIMEOUT", 0.05)
+    clients = UpstreamClients()
+    monkeypatch.setattr(api, "upstream_clients", clients)
+
+    async def start():
+        clients.start({"parking": ["http://parking"]})
+        clients._clients["parking"] = httpx.AsyncClient(transport=httpx.MockTransport(slow_upstream))
+
+    asyncio.run(start())
+    return clients
+
+
+async def cancel_sends(count: int):
+    tasks = [asyncio.create_task(api._send_upstream("parking", "/slots/", get_request("/parking/slots/"))) for _ in range(count)]
+    await asyncio.sleep(0.05)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_cancelled_sends_release_the_bulkhead(clients):
+    asyncio.run(cancel_sends(2))
+
+    stats = clients.stats()["parking"]
+    assert stats["in_flight"] == 0
+    assert stats["bulkhead"]["active"] == 0
+    assert all(replica["outstanding"] == 0 for replica in stats["replicas"])
+    # cancellations say nothing about the upstream's health
+    assert stats["breaker"]["consecutive_failures"] == 0
+
+
+def test_cancelled_half_open_trial_is_handed_back(clients):
+    breaker = clients.breakers["parking"]
+    breaker.trip()
+    breaker.opened_at = 0.0  # reset timeout elapsed, the next call is the trial
+
+    asyncio.run(cancel_sends(1))
+
+    assert breaker.state == breaker.HALF_OPEN
+    assert breaker.trial_in_flight is False
+    breaker.allow()  # a new trial may go through
+
+
+async def fast_upstream(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, stream=httpx.ByteStream(b"x" * 1000))
+
+
+@pytest.fixture
+def fast_clients(clients):
+    clients._clients["parking"] = httpx.AsyncClient(transport=httpx.MockTransport(fast_upstream))
+    return clients
+
+
+def test_streamed_body_releases_once(fast_clients):
+    async def run():
+        response = await api.forward_request("parking", "/slots/", get_request("/parking/slots/"))
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        await response.body_iterator.aclose()
+        return body
+
+    assert len(asyncio.run(run())) == 1000
+    stats = fast_clients.stats()["parking"]
+    assert stats["in_flight"] == 0 and stats["bulkhead"]["active"] == 0
+
+
+def test_response_dropped_before_streaming_releases(fast_clients):
+    async def run():
+        response = await api.forward_request("parking", "/slots/", get_request("/parking/slots/"))
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            raise OSError("client went away")
+
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        with pytest.raises(Exception):
+            await response(scope, receive, send)
+
+    asyncio.run(run())
+    stats = fast_clients.stats()["parking"]
+    assert stats["in_flight"] == 0
+    assert stats["bulkhead"]["active"] == 0
+    assert all(replica["outstanding"] == 0 for replica in stats["replicas"])
@@ -0,0 +1,150 @@
+import asyncio
+import httpx
+import pytest
+from app import api
+from app.balancer import ReplicaPool
+from app.config import settings
+from app.resilience import CircuitBreaker
+from app.upstream import UpstreamClients
+from tests.test_upstream_cancellation import get_request
+
+
+def make_clients(monkeypatch, urls, handler):
+    monkeypatch.setattr(settings, "UPSTREAM_RETRY_BASE_DELAY", 0.0)
+    clients = UpstreamClients()
+    monkeypatch.setattr(api, "upstream_clients", clients)
+
+    async def start():
+        clients.start({"parking": urls})
+        clients._clients["parking"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    asyncio.run(start())
+    return clients
+
+
+def status_by_host(statuses):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(statuses[request.url.host])
+    return handler
+
+
+async def send(count: int = 1):
+    for _ in range(count):
+        resp, replica = await api._send_upstream("parking", "/slots/", get_request("/parking/slots/"))
+        api.upstream_clients.end("parking", replica)
+        await resp.aclose()
+
+
+def test_application_errors_do_not_eject_or_trip(monkeypatch):
+    clients = make_clients(monkeypatch, ["http://a"], status_by_host({"a": 500}))
+    asyncio.run(send(10))
+
+    stats = clients.stats()["parking"]
+    assert stats["replicas"][0]["ejected"] is False
+    assert stats["replicas"][0]["consecutive_failures"] == 0
+    assert stats["breaker"]["state"] == "closed"
+
+
+def test_retried_request_counts_once(monkeypatch):
+    clients = make_clients(monkeypatch, ["http://a"], status_by_host({"a": 503}))
+    asyncio.run(send())
+
+    stats = clients.stats()["parking"]
+    assert stats["requests"] == 1 + settings.UPSTREAM_RETRIES
+    assert stats["replicas"][0]["consecutive_failures"] == 1
+    assert stats["breaker"]["consecutive_failures"] == 1
+
+
+def test_last_replica_is_never_ejected(monkeypatch):
+    clients = make_clients(monkeypatch, ["http://a"], status_by_host({"a": 503}))
+    clients.breakers["parking"].failure_threshold = 1000
+    asyncio.run(send(settings.UPSTREAM_EJECT_FAILURES * 3))
+
+    stats = clients.stats()["parking"]
+    assert stats["replicas"][0]["ejected"] is False
+    assert stats["ejections_skipped"] >= 1
+    asyncio.run(send())  # still routed, not "no healthy replicas"
+
+
+def test_retry_on_another_replica_settles_as_success(monkeypatch):
+    clients = make_clients(monkeypatch, ["http://a", "http://b"], status_by_host({"a": 503, "b": 200}))
+    clients.pools["parking"].balancer = type("First", (), {"choose": lambda self, replicas: replicas[0]})()
+    asyncio.run(send())
+
+    stats = clients.stats()["parking"]
+    failures = {r["url"]: r["consecutive_failures"] for r in stats["replicas"]}
+    assert failures == {"http://a": 1, "http://b": 0}
+    assert stats["breaker"]["consecutive_failures"] == 0
+
+
+def test_transport_errors_count_as_failures(monkeypatch):
+    async def refuse(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("refused", request=request)
+
+    clients = make_clients(monkeypatch, ["http://a"], refuse)
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(send())
+
+    stats = clients.stats()["parking"]
+    assert stats["in_flight"] == 0 and stats["bulkhead"]["active"] == 0
+    assert stats["replicas"][0]["consecutive_failures"] == 1
+    assert stats["breaker"]["consecutive_failures"] == 1
+
+
+def raising(error, calls):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host)
+        raise error("upstream", request=request)
+    return handler
+
+
+def test_connect_errors_are_retried(monkeypatch):
+    calls = []
+    clients = make_clients(monkeypatch, ["http://a"], raising(httpx.ConnectTimeout, calls))
+    with pytest.raises(httpx.ConnectTimeout):
+        asyncio.run(send())
+    assert len(calls) == 1 + settings.UPSTREAM_RETRIES
+    assert clients.stats()["parking"]["breaker"]["consecutive_failures"] == 1
+
+
+def test_read_timeouts_are_not_retried(monkeypatch):
+    calls = []
+    clients = make_clients(monkeypatch, ["http://a", "http://b"], raising(httpx.ReadTimeout, calls))
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(send())
+    # the request may have reached the upstream: sending it again would only add another READ_TIMEOUT
+    assert len(calls) == 1
+    assert clients.stats()["parking"]["breaker"]["consecutive_failures"] == 1
+
+
+def test_breaker_ignores_outcomes_while_open():
+    breaker = CircuitBreaker("parking", failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    opened_at = breaker.opened_at
+
+    # stragglers admitted before the breaker opened
+    breaker.record_failure()
+    breaker.record_success()
+    assert (breaker.state, breaker.opened_at, breaker.failures) == (breaker.OPEN, opened_at, 2)
+
+    # only the half-open trial decides
+    breaker.opened_at -= 30
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN and breaker.times_opened == 2
+    breaker.opened_at -= 30
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED and breaker.failures == 0
+
+
+@pytest.mark.parametrize("replicas, percent, max_out", [(1, 100, 0), (2, 50, 1), (4, 50, 2), (4, 100, 3), (10, 10, 1)])
+def test_ejected_fraction_is_capped(replicas, percent, max_out):
+    pool = ReplicaPool("parking", [f"http://r{n}" for n in range(replicas)], "round_robin",
+                       eject_failures=1, eject_time=30, max_ejected_percent=percent)
+    for replica in pool.replicas:
+        pool.record(replica, False)
+    assert sum(r["ejected"] for r in pool.stats()["replicas"]) == max_out
+    pool.acquire()
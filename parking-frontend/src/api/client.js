@@ -5,6 +5,7 @@ const API_BASE = "http://localhost:8000";
 const API_TIMEOUT = 10000;
 const STORAGE_KEYS = {
   TOKEN: "token",
+  REFRESH_TOKEN: "refreshToken",
   USER_EMAIL: "userEmail",
   USER_ROLE: "userRole"
 };
@@ -32,13 +33,47 @@ apiClient.interceptors.request.use(
   }
 );
 
+// Exchange the stored refresh token for a new token pair. Concurrent 401s
+// share one call, since each refresh token can only be redeemed once.
+let refreshInFlight = null;
+const refreshAccessToken = () => {
+  if (!refreshInFlight) {
+    const refreshToken = localStorage.getItem(STORAGE_KEYS.REFRESH_TOKEN);
+    refreshInFlight = (refreshToken
+      ? axios.post(`${API_BASE}/token/refresh/`, { refresh_token: refreshToken }, { timeout: API_TIMEOUT })
+          .then(({ data }) => {
+            setAuthToken(data.access_token, data.refresh_token);
+            return data.access_token;
+          })
+      : Promise.reject(new Error("No refresh token"))
+    ).finally(() => {
+      refreshInFlight = null;
+    });
+  }
+  return refreshInFlight;
+};
+
 // Response interceptor to handle auth errors
 apiClient.interceptors.response.use(
   (response) => response.data,
-  (error) => {
+  async (error) => {
+    const original = error.config;
+    const isAuthCall = original?.url === '/login/';
+    if (error.response?.status === 401 && original && !original._retried && !isAuthCall) {
+      // Access token expired: renew it once and replay the request
+      original._retried = true;
+      try {
+        const token = await refreshAccessToken();
+        original.headers.Authorization = `Bearer ${token}`;
+        return apiClient(original);
+      } catch (refreshError) {
+        // fall through to logging out
+      }
+    }
     if (error.response?.status === 401) {
       // Clear auth data and redirect to login
       localStorage.removeItem(STORAGE_KEYS.TOKEN);
+      localStorage.removeItem(STORAGE_KEYS.REFRESH_TOKEN);
       localStorage.removeItem(STORAGE_KEYS.USER_EMAIL);
       localStorage.removeItem(STORAGE_KEYS.USER_ROLE);
       window.location.href = '/login';
@@ -48,13 +83,17 @@ apiClient.interceptors.response.use(
 );
 
 // Utility functions
-export const setAuthToken = (token) => {
+export const setAuthToken = (token, refreshToken) => {
   localStorage.setItem(STORAGE_KEYS.TOKEN, token);
+  if (refreshToken) localStorage.setItem(STORAGE_KEYS.REFRESH_TOKEN, refreshToken);
   apiClient.defaults.headers.common['Authorization'] = `Bearer ${token}`;
 };
 
+export const getRefreshToken = () => localStorage.getItem(STORAGE_KEYS.REFRESH_TOKEN);
+
 export const clearAuth = () => {
   localStorage.removeItem(STORAGE_KEYS.TOKEN);
+  localStorage.removeItem(STORAGE_KEYS.REFRESH_TOKEN);
   localStorage.removeItem(STORAGE_KEYS.USER_EMAIL);
   localStorage.removeItem(STORAGE_KEYS.USER_ROLE);
   delete apiClient.defaults.headers.common['Authorization'];
@@ -97,6 +136,12 @@ export const authAPI = {
     });
     return response;
   },
+
+  // Revoke the session server-side; the access token simply expires
+  logout: async (refreshToken) => {
+    const response = await apiClient.post('/logout/', { refresh_token: refreshToken });
+    return response;
+  },
   
   register: async (userData) => {
     const response = await apiClient.post('/user/users/', userData);
@@ -123,6 +168,14 @@ export const parkingAPI = {
     return response;
   },
   
+  // Get a page of stations with their available slots nested (one round trip)
+  getStationsWithSlots: async (cursor = null, limit = 100) => {
+    const response = await apiClient.get('/parking/stations/with-slots', {
+      params: { limit, ...(cursor ? { cursor } : {}) }
+    });
+    return response;
+  },
+  
   // Get slots for a specific station
   getSlotsByStation: async (stationId) => {
     const response = await apiClient.get(`/parking/stations/${stationId}/slots`);
@@ -1,5 +1,5 @@
 import React, { createContext, useState, useEffect } from "react";
-import { setAuthToken, clearAuth } from "../api/client";
+import { setAuthToken, clearAuth, getRefreshToken, authAPI } from "../api/client";
 
 export const AuthContext = createContext(null);
 export function AuthProvider({ children }) {
@@ -51,8 +51,9 @@ export function AuthProvider({ children }) {
 
   const isAdmin = userRole === "admin" || userRole === "superadmin";
 
-  const login = (tokenValue) => {
+  const login = (tokenValue, refreshTokenValue) => {
     if (!tokenValue) return;
+    setAuthToken(tokenValue, refreshTokenValue);
     setToken(tokenValue);
     const payload = decodeJwtPayload(tokenValue);
     if (payload) {
@@ -64,6 +65,9 @@ export function AuthProvider({ children }) {
   };
 
   const logout = () => {
+    // read before clearAuth drops it; a failed revoke still logs out locally
+    const refreshToken = getRefreshToken();
+    if (refreshToken) authAPI.logout(refreshToken).catch(() => {});
     setToken(null);
     setUserEmail("");
     setUserRole(null);
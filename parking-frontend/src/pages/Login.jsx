@@ -51,7 +51,7 @@ export default function Login(){
       if (response && response.access_token) {
         console.log("✅ Access token received");
         // Use AuthContext.login which will store token, decode payload, and set headers
-        login(response.access_token);
+        login(response.access_token, response.refresh_token);
         navigate("/dashboard");
       } else {
         console.error("❌ No access_token in response:", response);
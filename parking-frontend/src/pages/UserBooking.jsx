@@ -35,43 +35,30 @@ export default function UserBooking() {
       setLoading(true);
       setError("");
       
-      // Fetch all stations
-      const stationsResponse = await parkingAPI.getStations();
-      let allStations = [];
-      
-      if (Array.isArray(stationsResponse)) {
-        allStations = stationsResponse;
-      } else if (stationsResponse && Array.isArray(stationsResponse.stations)) {
-        allStations = stationsResponse.stations;
-      }
-      
-      setStations(allStations);
-      
-      // Fetch all available slots from all stations
+      // Stations come back with their available slots nested, so this is
+      // one request per page of stations instead of one per station
+      const allStations = [];
       const allAvailableSlots = [];
+      let cursor = null;
       
-      for (const station of allStations) {
-        try {
-          const stationId = station._id || station.id;
-          const slotsResponse = await parkingAPI.getSlotsByStation(stationId);
-          
-          if (Array.isArray(slotsResponse)) {
-            const availableSlots = slotsResponse
-              .filter(slot => slot.is_available && slot.status !== "occupied")
-              .map(slot => ({
-                ...slot,
-                station_name: station.name || station.station_name,
-                station_location: station.location || station.address,
-                station_id: stationId
-              }));
-            
-            allAvailableSlots.push(...availableSlots);
-          }
-        } catch (slotError) {
-          console.error(`Failed to fetch slots for station ${station.name}:`, slotError);
+      do {
+        const stationsPage = await parkingAPI.getStationsWithSlots(cursor);
+        
+        for (const station of stationsPage.items || []) {
+          const { slots, ...stationInfo } = station;
+          allStations.push(stationInfo);
+          allAvailableSlots.push(...slots.map(slot => ({
+            ...slot,
+            station_name: station.name,
+            station_location: station.location,
+            station_id: station.id
+          })));
         }
-      }
+        
+        cursor = stationsPage.next_cursor;
+      } while (cursor);
       
+      setStations(allStations);
       setAllSlots(allAvailableSlots);
       
     } catch (err) {
@@ -0,0 +1,34 @@
+"""add booking overlap exclusion constraint
+
+Revision ID: 5c3e8a1f2b7d
+Revises: 0e1b9296d4ca
+Create Date: 2026-10-18 10:40:12.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c3e8a1f2b7d'
+down_revision: Union[str, Sequence[str], None] = '0e1b9296d4ca'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # gist cannot index plain integers (slot_id WITH =) without btree_gist
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(
+        "ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap "
+        "EXCLUDE USING gist (slot_id WITH =, tsrange(start_time, end_time) WITH &&) "
+        "WHERE (status = 'booked')"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('bookings_no_overlap', 'bookings')
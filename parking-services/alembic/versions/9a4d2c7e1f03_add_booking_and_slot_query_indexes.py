@@ -0,0 +1,39 @@
+"""add booking and slot query indexes
+
+Revision ID: 9a4d2c7e1f03
+Revises: 5c3e8a1f2b7d
+Create Date: 2026-10-18 11:05:47.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4d2c7e1f03'
+down_revision: Union[str, Sequence[str], None] = '5c3e8a1f2b7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # slot_id + time-range lookups over booked rows are served by the
+    # bookings_no_overlap gist index, so they get no btree of their own
+    op.create_index(
+        'ix_bookings_user_id_start_time',
+        'bookings',
+        ['user_id', sa.text('start_time DESC')],
+        unique=False,
+    )
+    op.create_index('ix_slots_station_id_status', 'slots', ['station_id', 'status'], unique=False)
+    op.create_index(op.f('ix_station_admin_id'), 'station', ['admin_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_station_admin_id'), table_name='station')
+    op.drop_index('ix_slots_station_id_status', table_name='slots')
+    op.drop_index('ix_bookings_user_id_start_time', table_name='bookings')
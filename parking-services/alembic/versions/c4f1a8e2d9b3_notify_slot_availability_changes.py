@@ -0,0 +1,57 @@
+"""notify slot availability changes
+
+Revision ID: c4f1a8e2d9b3
+Revises: 9a4d2c7e1f03
+Create Date: 2026-10-18 19:05:44.102731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f1a8e2d9b3'
+down_revision: Union[str, Sequence[str], None] = '9a4d2c7e1f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # publish the id of every changed slot on commit, for each worker's availability index
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_slot_availability() RETURNS trigger AS $$
+        DECLARE
+            old_slot integer;
+            new_slot integer;
+        BEGIN
+            IF TG_TABLE_NAME = 'slots' THEN
+                IF TG_OP <> 'INSERT' THEN old_slot := OLD.id; END IF;
+                IF TG_OP <> 'DELETE' THEN new_slot := NEW.id; END IF;
+            ELSE
+                IF TG_OP <> 'INSERT' THEN old_slot := OLD.slot_id; END IF;
+                IF TG_OP <> 'DELETE' THEN new_slot := NEW.slot_id; END IF;
+            END IF;
+            IF old_slot IS NOT NULL THEN PERFORM pg_notify('slot_availability', old_slot::text); END IF;
+            IF new_slot IS NOT NULL THEN PERFORM pg_notify('slot_availability', new_slot::text); END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(
+        "CREATE TRIGGER slots_notify_availability AFTER INSERT OR UPDATE OR DELETE ON slots "
+        "FOR EACH ROW EXECUTE FUNCTION notify_slot_availability()"
+    )
+    op.execute(
+        "CREATE TRIGGER bookings_notify_availability AFTER INSERT OR UPDATE OR DELETE ON bookings "
+        "FOR EACH ROW EXECUTE FUNCTION notify_slot_availability()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS bookings_notify_availability ON bookings")
+    op.execute("DROP TRIGGER IF EXISTS slots_notify_availability ON slots")
+    op.execute("DROP FUNCTION IF EXISTS notify_slot_availability()")
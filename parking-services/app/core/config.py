@@ -1,4 +1,5 @@
 from pydantic_settings  import BaseSettings
+from typing import Optional
 
 class Settings(BaseSettings):
     DB_HOSTNAME: str
@@ -6,10 +7,40 @@ class Settings(BaseSettings):
     DB_PASSWORD: str
     DB_NAME: str
     DB_USERNAME: str
-    SECRET_KEY: str
+    # accepted token algorithms, comma separated, e.g. "RS256" or "RS256,HS256" while migrating;
+    # RS*/ES* tokens are verified with the user service's published keys, HS* with SECRET_KEY
+    SECRET_KEY: Optional[str] = None
     ALGORITHMS: str
     ACCESS_TOKEN_EXPIRATION_TIME:int =30
 
+    # connection pool tuning (per replica)
+    DB_ECHO: bool = False
+    # no overflow: overflow connections are closed on checkin and reopened under load,
+    # which stretches the p99 (see user-services/scripts/bench_db_engine.py)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 0
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 5000
+
+    # in-process user dashboard cache, 0 disables it
+    DASHBOARD_CACHE_TTL: int = 30
+
+    # station/slot read-through cache; without REDIS_URL a process-local dict is used
+    REDIS_URL: Optional[str] = None
+    CACHE_TTL: int = 300
+
+    # must match the gateway's INTERNAL_SIGNING_KEY to trust its X-Internal-Claims header
+    INTERNAL_SIGNING_KEY: Optional[str] = None
+
+    # user service public keys, cached by kid; an unknown kid refetches them
+    # early (a key rotation), at most once per JWKS_MIN_REFRESH_INTERVAL
+    JWKS_URL: str = "http://user_services:8000/.well-known/jwks.json"
+    JWKS_CACHE_TTL: float = 300.0
+    JWKS_MIN_REFRESH_INTERVAL: float = 30.0
+    JWKS_TIMEOUT: float = 3.0
+
     model_config = {
         "env_file": ".env",
         "extra": "ignore"
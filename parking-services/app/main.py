@@ -1,6 +1,10 @@
 from fastapi import FastAPI
+from sqlalchemy import text
 from app.routes import slots,station,admin_booking,bookings
-from app.database.db import Base, engine
+from app.database.db import Base, SessionLocal, connect_listener, engine, get_pool_stats
+from app.utils.availability import availability_index
+from app.utils.cache import row_cache
+from app.utils import auth_utils
 
 app=FastAPI()
 
@@ -8,9 +12,33 @@ app=FastAPI()
 async def root():
     return {"message":"from parking backend"}
 
+@app.get("/db/pool")
+async def db_pool_stats():
+    return get_pool_stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return row_cache.stats()
+
+@app.get("/availability/stats")
+async def availability_stats():
+    return availability_index.stats()
+
 @app.on_event("startup")
-def on_startup():
-    Base.metadata.create_all(bind=engine)
+async def on_startup():
+    async with engine.begin() as conn:
+        # required by the bookings overlap exclusion constraint
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+        await conn.run_sync(Base.metadata.create_all)
+    # loads the index, then keeps it current from the database's change notifications
+    availability_index.start(connect_listener, SessionLocal)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await availability_index.stop()
+    await engine.dispose()
+    await row_cache.backend.close()
+    await auth_utils.jwks_cache.close()
 
 app.include_router(slots.router)
 app.include_router(station.router)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column,Integer,String,ForeignKey,DateTime,DECIMAL,Enum
+from sqlalchemy import DDL,Column,Integer,String,ForeignKey,DateTime,DECIMAL,Enum,Index,event,func,text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime       
 import enum
@@ -25,7 +26,7 @@ class Parking(Base):
     location=Column(String,nullable=False,index=True)
     capacity=Column(Integer,nullable=True,index=True)
     created_at=Column(DateTime,default=datetime.utcnow)
-    admin_id=Column(Integer,nullable=False)
+    admin_id=Column(Integer,nullable=False,index=True)
 
     # One station → many slots
     slots = relationship("Slot", back_populates="station", cascade="all, delete-orphan")
@@ -49,6 +50,11 @@ class Slot(Base):
     # One slot → many bookings
     bookings = relationship("Booking", back_populates="slot", cascade="all, delete-orphan")
 
+    # station slot listings and availability counts
+    __table_args__ = (
+        Index("ix_slots_station_id_status", "station_id", "status"),
+    )
+
 # ---BOOKINGS TABLE---
 class Booking(Base):
     __tablename__ = "bookings"
@@ -62,4 +68,56 @@ class Booking(Base):
     price=Column(DECIMAL)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    slot = relationship("Slot", back_populates="bookings")
\ No newline at end of file
+    slot = relationship("Slot", back_populates="bookings")
+
+    # No two active bookings of the same slot may overlap in time (needs the btree_gist extension);
+    # its gist index also serves per-slot lookups of active bookings
+    __table_args__ = (
+        ExcludeConstraint(
+            (slot_id, "="),
+            (func.tsrange(start_time, end_time), "&&"),
+            name="bookings_no_overlap",
+            using="gist",
+            where=text("status = 'booked'"),
+        ),
+        # user history / dashboard, newest first
+        Index("ix_bookings_user_id_start_time", "user_id", start_time.desc()),
+    )
+
+# ---AVAILABILITY NOTIFICATIONS---
+# Every committed change to a slot or its bookings publishes the slot id, so
+# each worker's availability index can reload just that slot. pg_notify is
+# transactional: nothing is sent for rolled back writes. The alembic
+# migration c4f1a8e2d9b3 installs the same triggers.
+AVAILABILITY_CHANNEL = "slot_availability"
+
+AVAILABILITY_TRIGGERS = [
+    f"""
+    CREATE OR REPLACE FUNCTION notify_slot_availability() RETURNS trigger AS $$
+    DECLARE
+        old_slot integer;
+        new_slot integer;
+    BEGIN
+        -- each branch only touches the columns of its own table
+        IF TG_TABLE_NAME = 'slots' THEN
+            IF TG_OP <> 'INSERT' THEN old_slot := OLD.id; END IF;
+            IF TG_OP <> 'DELETE' THEN new_slot := NEW.id; END IF;
+        ELSE
+            IF TG_OP <> 'INSERT' THEN old_slot := OLD.slot_id; END IF;
+            IF TG_OP <> 'DELETE' THEN new_slot := NEW.slot_id; END IF;
+        END IF;
+        -- identical notifications within a transaction are sent once
+        IF old_slot IS NOT NULL THEN PERFORM pg_notify('{AVAILABILITY_CHANNEL}', old_slot::text); END IF;
+        IF new_slot IS NOT NULL THEN PERFORM pg_notify('{AVAILABILITY_CHANNEL}', new_slot::text); END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "CREATE TRIGGER slots_notify_availability AFTER INSERT OR UPDATE OR DELETE ON slots "
+    "FOR EACH ROW EXECUTE FUNCTION notify_slot_availability()",
+    "CREATE TRIGGER bookings_notify_availability AFTER INSERT OR UPDATE OR DELETE ON bookings "
+    "FOR EACH ROW EXECUTE FUNCTION notify_slot_availability()",
+]
+
+for _statement in AVAILABILITY_TRIGGERS:
+    event.listen(Booking.__table__, "after_create", DDL(_statement))
@@ -1,18 +1,8 @@
 from pydantic import BaseModel
 from typing import Optional,Dict,List
-import enum
 from datetime import datetime
-
-#  --------ENUMS---------
-class SlotStatus(str,enum.Enum):
-    available="available"
-    booked="booked"
-    cancelled="cancelled"
-
-class SlotType(str,enum.Enum):
-    car="car"
-    bike="bike"
-    ev="ev"
+# one definition of the enums, shared with the ORM columns
+from app.models.models import SlotStatus, SlotType
 
 # ADD admin station
 class StationIn(BaseModel):
@@ -78,7 +68,7 @@ class Dashboard(BaseModel):
 #   BOOKING SERVICES SCEHMAS
 # take bookings
 class BookSlot(BaseModel):
-    station_id:str
+    station_id:int
     slot_number:str
     duration:int
 
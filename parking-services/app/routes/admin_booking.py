@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import csv
+import enum
+import io
+import json
+from decimal import Decimal
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, true
 from datetime import datetime
+from typing import Any, AsyncIterator, Optional
 from app.database import db
 from app.utils import auth_utils
+from app.utils.pagination import PageSize, after_booking_cursor, booking_cursor, page
 from app.models import models ,schemas
 
 router = APIRouter(prefix="/bookings/admin", tags=["admin booking"])
@@ -12,80 +20,207 @@ router = APIRouter(prefix="/bookings/admin", tags=["admin booking"])
 # Get bookings for admin's stations
 # ------------------------------
 @router.get("/", dependencies=[Depends(auth_utils.requires_role("admin"))])
-def get_booking(
-    db: Session = Depends(db.get_db),
-    payload: dict = Depends(auth_utils.get_token_payload)
+async def get_booking(
+    db: AsyncSession = Depends(db.get_db),
+    payload: dict = Depends(auth_utils.get_token_payload),
+    slot_type: Optional[schemas.SlotType] = None,
+    booking_status: Optional[schemas.SlotStatus] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = PageSize
 ):
-    user_id = payload.get("sub")
+    user_id = payload.get("id")
 
     # Get stations posted by admin
-    admin_station = db.query(models.Parking).filter(models.Parking.admin_id == user_id).first()
+    admin_station = await db.scalar(select(models.Parking).filter(models.Parking.admin_id == user_id))
     if not admin_station:
         raise HTTPException(
             status_code=status.HTTP_204_NO_CONTENT,
             detail="No station found - admin should add station first"
         )
 
-    # Get all bookings for that station by joining booking and station table
-    bookings = db.query(models.Booking).join(models.Slot,models.Slot.id== models.Booking.slot_id ,isouter=True ).group_by(models.Booking.id).all()
+    # Get a page of bookings for that station by joining booking and slot table,
+    # keyset paginated on (start_time, id), newest first
+    query = (
+        select(models.Booking)
+        .join(models.Slot, models.Slot.id == models.Booking.slot_id)
+        .filter(models.Slot.station_id == admin_station.id)
+    )
+    if slot_type is not None:
+        query = query.filter(models.Slot.slot_type == slot_type)
+    if booking_status is not None:
+        query = query.filter(models.Booking.status == booking_status)
+    if start_from is not None:
+        query = query.filter(models.Booking.start_time >= start_from)
+    if start_to is not None:
+        query = query.filter(models.Booking.start_time < start_to)
+    if cursor:
+        query = query.filter(after_booking_cursor(cursor))
+
+    result = await db.execute(
+        query.order_by(models.Booking.start_time.desc(), models.Booking.id.desc()).limit(limit + 1)
+    )
+    bookings = result.scalars().all()
 
-    return bookings
+    return page(bookings, limit, booking_cursor)
 
 
 # ------------------------------
 # Admin dashboard
 # ------------------------------
+# Slot and booking stats for the admin's station in one statement (one round trip).
+# Slots and bookings are aggregated in separate lateral subqueries: aggregating
+# over their join would repeat each slot once per booking and need a DISTINCT sort.
+def dashboard_query(admin_id: int, now: datetime):
+    slot_stats = (
+        select(
+            func.count(models.Slot.id).label("total_slots"),
+            func.count(models.Slot.id).filter(models.Slot.status == "available").label("available_slots"),
+        )
+        .filter(models.Slot.station_id == models.Parking.id)
+        .lateral("slot_stats")
+    )
+    booking_stats = (
+        select(
+            func.count(models.Booking.id).filter(models.Booking.end_time < now).label("past_bookings"),
+            func.count(models.Booking.id).filter(models.Booking.start_time >= now).label("upcoming_bookings"),
+            func.count(models.Booking.id).filter(
+                models.Booking.start_time <= now,
+                models.Booking.end_time >= now
+            ).label("active_bookings"),
+            func.coalesce(func.sum(models.Booking.price).filter(models.Booking.end_time < now), 0).label("revenue"),
+        )
+        .join(models.Slot, models.Booking.slot_id == models.Slot.id)
+        .filter(models.Slot.station_id == models.Parking.id)
+        .lateral("booking_stats")
+    )
+    return (
+        select(
+            models.Parking.id.label("station_id"),
+            slot_stats.c.total_slots,
+            slot_stats.c.available_slots,
+            booking_stats.c.past_bookings,
+            booking_stats.c.upcoming_bookings,
+            booking_stats.c.active_bookings,
+            booking_stats.c.revenue,
+        )
+        .select_from(models.Parking)
+        .join(slot_stats, true())
+        .join(booking_stats, true())
+        .filter(models.Parking.admin_id == admin_id)
+        .limit(1)
+    )
+
 @router.get("/dashboard", dependencies=[Depends(auth_utils.requires_role("admin"))])
-def get_dashboard(
-    db: Session = Depends(db.get_db),
+async def get_dashboard(
+    db: AsyncSession = Depends(db.get_db),
     payload: dict = Depends(auth_utils.get_token_payload)
 ):
     user_id = payload.get("id")
     now = datetime.utcnow()
 
-    # Get admin's station
-    admin_station = db.query(models.Parking).filter(models.Parking.admin_id == user_id).first()
-    if not admin_station:
+    dashboard = (await db.execute(dashboard_query(user_id, now))).first()
+
+    if not dashboard:
         raise HTTPException(status_code=404, detail="No station found")
-    
-    station_id = admin_station.id
-
-    # SLOT STATS
-    total_slots = db.query(models.Slot).filter(models.Slot.station_id == station_id).count()
-    available_slots = db.query(models.Slot).filter(models.Slot.station_id == station_id, models.Slot.status == "available").count()
-
-    # BOOKING STATS
-    past_booking_count = db.query(models.Booking).filter(
-        models.Booking.slot_id.in_(db.query(models.Slot.id).filter(models.Slot.station_id == station_id)),
-        models.Booking.end_time < now
-    ).count()
-
-    upcoming_booking_count = db.query(models.Booking).filter(
-        models.Booking.slot_id.in_(db.query(models.Slot.id).filter(models.Slot.station_id == station_id)),
-        models.Booking.start_time >= now
-    ).count()
-
-    active_booking_count = db.query(models.Booking).filter(
-        models.Booking.slot_id.in_(db.query(models.Slot.id).filter(models.Slot.station_id == station_id)),
-        models.Booking.start_time <= now,
-        models.Booking.end_time >= now
-    ).count()
-
-    # REVENUE FROM PAST BOOKINGS
-    total_revenue = db.query(models.Booking).filter(
-        models.Booking.slot_id.in_(db.query(models.Slot.id).filter(models.Slot.station_id == station_id)),
-        models.Booking.end_time < now
-    ).with_entities(func.sum(models.Booking.price)).scalar() or 0
+
     return {
-        "station_id": station_id,
+        "station_id": dashboard.station_id,
         "slots": {
-            "total": total_slots,
-            "available": available_slots
+            "total": dashboard.total_slots,
+            "available": dashboard.available_slots
         },
         "bookings": {
-            "past": past_booking_count,
-            "upcoming": upcoming_booking_count,
-            "active": active_booking_count
+            "past": dashboard.past_bookings,
+            "upcoming": dashboard.upcoming_bookings,
+            "active": dashboard.active_bookings
         },
-        "revenue": float(total_revenue)
+        "revenue": float(dashboard.revenue)
     }
+
+
+# ------------------------------
+# Streaming bookings export (admin: own station, superadmin: any or all stations)
+# ------------------------------
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ["id", "user_id", "slot_id", "station_id", "slot_number", "start_time", "end_time", "status", "price", "created_at"]
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+async def _stream_bookings(query, fmt: str) -> AsyncIterator[str]:
+    # dedicated session: request-scoped dependencies are closed before a streamed body is sent
+    async with db.SessionLocal() as session:
+        # server-side cursor, fetched and emitted EXPORT_BATCH_SIZE rows at a time
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            yield buffer.getvalue()
+        async for rows in result.partitions():
+            if fmt == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([_export_value(value) for value in row] for row in rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(EXPORT_COLUMNS, (_export_value(value) for value in row)))) + "\n"
+                    for row in rows
+                )
+
+@router.get("/export", dependencies=[Depends(auth_utils.requires_any_role("admin", "superadmin"))])
+async def export_bookings(
+    db: AsyncSession = Depends(db.get_db),
+    payload: dict = Depends(auth_utils.get_token_payload),
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    station_id: Optional[int] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None
+):
+    # admins can only export their own station
+    if payload.get("role") == "admin":
+        admin_station = await db.scalar(select(models.Parking).filter(models.Parking.admin_id == payload.get("id")))
+        if not admin_station:
+            raise HTTPException(status_code=404, detail="No station found")
+        if station_id is not None and station_id != admin_station.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins can only export their own station")
+        station_id = admin_station.id
+
+    query = (
+        select(
+            models.Booking.id,
+            models.Booking.user_id,
+            models.Booking.slot_id,
+            models.Slot.station_id,
+            models.Slot.slot_number,
+            models.Booking.start_time,
+            models.Booking.end_time,
+            models.Booking.status,
+            models.Booking.price,
+            models.Booking.created_at
+        )
+        .join(models.Slot, models.Slot.id == models.Booking.slot_id)
+        .order_by(models.Booking.id)
+    )
+    if station_id is not None:
+        query = query.filter(models.Slot.station_id == station_id)
+    if start_from is not None:
+        query = query.filter(models.Booking.start_time >= start_from)
+    if start_to is not None:
+        query = query.filter(models.Booking.start_time < start_to)
+
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _stream_bookings(query, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="bookings.{fmt}"'}
+    )
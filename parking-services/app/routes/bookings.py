@@ -1,9 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
 from typing import cast
-from sqlalchemy.orm import Session
+from sqlalchemy import DateTime, Integer, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from app.database import db
 from app.utils import auth_utils
+from app.utils.availability import availability_index
+from app.utils.cache import dashboard_cache, row_cache, slot_key
+from app.utils.pagination import PageSize, after_booking_cursor, booking_cursor, page
 from app.models.models import Booking, Slot
 from app.models.schemas import BookSlot, Bookedslot, UserDashboard
 from app.models.schemas import SlotStatus
@@ -13,11 +19,57 @@ router = APIRouter(prefix="/bookings", tags=["bookings"])
 # ------------------------------
 # Book a slot (user role)
 # ------------------------------
+# Claim the slot only if it is still available; the row lock taken by the
+# UPDATE makes concurrent bookers of the same slot queue here instead of racing.
+# The booking is inserted from the claimed slot in the same statement (one round trip).
+# Overlaps are rejected by the bookings_no_overlap exclusion constraint.
+OVERLAP_CONSTRAINT = "bookings_no_overlap"
+EXCLUSION_VIOLATION = "23P01"  # sqlstate
+
+def violates_overlap(error: IntegrityError) -> bool:
+    """Whether `error` is bookings_no_overlap rejecting the booking, rather than any other integrity error."""
+    orig = error.orig
+    # asyncpg keeps the constraint on the error the dbapi adapter wraps; psycopg2 on its diag
+    name = getattr(orig.__cause__, "constraint_name", None) or getattr(getattr(orig, "diag", None), "constraint_name", None)
+    if name is not None:
+        return name == OVERLAP_CONSTRAINT
+    return getattr(orig, "pgcode", None) == EXCLUSION_VIOLATION
+
+def booking_insert(user_id: int, booking: BookSlot, start_time: datetime, end_time: datetime):
+    slot_claim = (
+        update(Slot)
+        .where(
+            Slot.station_id == booking.station_id,
+            Slot.slot_number == booking.slot_number,
+            Slot.status == SlotStatus.available
+        )
+        .values(status=SlotStatus.booked)
+        .returning(Slot.id, Slot.price_per_hour)
+        .cte("slot_claim")
+    )
+    return (
+        insert(Booking)
+        .from_select(
+            ["user_id", "slot_id", "start_time", "end_time", "status", "price", "created_at"],
+            select(
+                literal(user_id, Integer),
+                slot_claim.c.id,
+                literal(start_time, DateTime),
+                literal(end_time, DateTime),
+                literal(SlotStatus.booked, Booking.status.type),
+                slot_claim.c.price_per_hour * booking.duration,
+                literal(start_time, DateTime)
+            ),
+            include_defaults=False
+        )
+        .returning(Booking.id, Booking.slot_id, Booking.price)
+    )
+
 @router.post("/", dependencies=[Depends(auth_utils.requires_role("user"))], response_model=Bookedslot)
-def book_slot(
+async def book_slot(
     booking: BookSlot,
     payload: dict = Depends(auth_utils.get_token_payload),
-    db: Session = Depends(db.get_db)
+    db: AsyncSession = Depends(db.get_db)
 ):
     user_id = payload.get("id")
 
@@ -25,114 +77,162 @@ def book_slot(
     start_time = datetime.utcnow()
     end_time = start_time + timedelta(hours=booking.duration)
 
-    # Fetch the slot from DB and check if available
-    slot_obj = db.query(Slot).filter(
-        Slot.station_id == booking.station_id,
-        Slot.slot_number == booking.slot_number,
-        Slot.status == SlotStatus.available
-    ).first()
-
-    if not slot_obj:
-        raise HTTPException(status_code=404, detail="Slot not found or not available")
-
-    # Check for overlapping bookings for this slot
-    conflict = db.query(Booking).filter(
-        Booking.slot_id == slot_obj.id,
-        Booking.status == SlotStatus.booked,
-        Booking.start_time < end_time,
-        Booking.end_time > start_time
-    ).first()
-
-    if conflict:
+    try:
+        created = (await db.execute(booking_insert(user_id, booking, start_time, end_time))).one_or_none()
+    except IntegrityError as e:
+        await db.rollback()
+        if not violates_overlap(e):
+            raise
         raise HTTPException(status_code=409, detail="Slot already booked for this time range")
 
-    # Mark slot as booked
-    slot_obj["status"] = SlotStatus.booked
-    db.commit()
-
-    # Create booking record
-    new_booking = Booking(
-        user_id=user_id,
-        slot_id=slot_obj.id,
-        start_time=start_time,
-        end_time=end_time,
-        status=SlotStatus.booked,
-        price=slot_obj.price_per_hour * booking.duration  # Assuming Slot has price_per_hour
-    )
+    if created is None:
+        await db.rollback()
+        slot_exists = await db.scalar(select(Slot.id).filter(
+            Slot.station_id == booking.station_id,
+            Slot.slot_number == booking.slot_number
+        ))
+        if slot_exists:
+            raise HTTPException(status_code=409, detail="Slot already booked for this time range")
+        raise HTTPException(status_code=404, detail="Slot not found or not available")
 
-    db.add(new_booking)
-    db.commit()
-    db.refresh(new_booking)
+    await db.commit()
+    dashboard_cache.invalidate(user_id)
+    await row_cache.invalidate(slot_key(created.slot_id))
+    availability_index.book(created.slot_id, created.id, start_time, end_time)
 
-    return new_booking
+    return {
+        "station_id": booking.station_id,
+        "slot_number": booking.slot_number,
+        "duration": booking.duration,
+        "price": created.price,
+        "status": SlotStatus.booked,
+        "start_time": start_time,
+        "end_time": end_time
+    }
 
 # ------------------------------
 # User booking history
 # ------------------------------
+# keyset pagination on (start_time, id), newest first; served by ix_bookings_user_id_start_time
+def history_query(
+    user_id: int,
+    limit: int,
+    station_id: Optional[int] = None,
+    booking_status: Optional[SlotStatus] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    cursor: Optional[str] = None
+):
+    query = select(Booking).filter(Booking.user_id == user_id)
+    if station_id is not None:
+        query = query.join(Slot, Slot.id == Booking.slot_id).filter(Slot.station_id == station_id)
+    if booking_status is not None:
+        query = query.filter(Booking.status == booking_status)
+    if start_from is not None:
+        query = query.filter(Booking.start_time >= start_from)
+    if start_to is not None:
+        query = query.filter(Booking.start_time < start_to)
+    if cursor:
+        query = query.filter(after_booking_cursor(cursor))
+    return query.order_by(Booking.start_time.desc(), Booking.id.desc()).limit(limit + 1)
+
 @router.get("/history", dependencies=[Depends(auth_utils.requires_role("user"))])
-def user_bookings(
-    db: Session = Depends(db.get_db),
-    payload: dict = Depends(auth_utils.get_token_payload)
+async def user_bookings(
+    db: AsyncSession = Depends(db.get_db),
+    payload: dict = Depends(auth_utils.get_token_payload),
+    station_id: Optional[int] = None,
+    booking_status: Optional[SlotStatus] = None,
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = PageSize
 ):
     user_id = payload.get("id")
-    bookings = db.query(Booking).filter(Booking.user_id == user_id).order_by(Booking.start_time.desc()).all()
-    return bookings
+
+    result = await db.execute(history_query(user_id, limit, station_id, booking_status, start_from, start_to, cursor))
+    bookings = result.scalars().all()
+    return page(bookings, limit, booking_cursor)
 
 # ------------------------------
 # User dashboard
 # ------------------------------
+# The counts are window aggregates over all of the user's bookings and are
+# evaluated before LIMIT, so the newest row carries them: one query per dashboard
+def user_dashboard_query(user_id: int, now: datetime):
+    return (
+        select(
+            Booking,
+            func.count(Booking.id).filter(Booking.end_time < now).over().label("past_bookings"),
+            func.count(Booking.id).filter(Booking.end_time >= now).over().label("upcoming_bookings"),
+            func.count(Booking.id).over().label("total_bookings")
+        )
+        .filter(Booking.user_id == user_id)
+        .order_by(Booking.start_time.desc())
+        .limit(1)
+    )
+
 @router.get("/user/dashboard", dependencies=[Depends(auth_utils.requires_role("user"))], response_model=UserDashboard)
-def user_dashboard(
-    db: Session = Depends(db.get_db),
+async def user_dashboard(
+    db: AsyncSession = Depends(db.get_db),
     payload: dict = Depends(auth_utils.get_token_payload)
 ):
     user_id = payload.get("id")
-    now = datetime.utcnow()
 
-    past_count = db.query(Booking).filter(
-        Booking.user_id == user_id,
-        Booking.end_time < now
-    ).count()
+    cached = dashboard_cache.get(user_id)
+    if cached is not None:
+        return cached
 
-    upcoming_count = db.query(Booking).filter(
-        Booking.user_id == user_id,
-        Booking.end_time >= now
-    ).count()
-
-    total_count = db.query(Booking).filter(
-        Booking.user_id == user_id
-    ).count()
-
-    last_booking = db.query(Booking).filter(
-        Booking.user_id == user_id
-    ).order_by(Booking.start_time.desc()).first()
-
-    return {
-        "past_bookings": past_count,
-        "upcoming_bookings": upcoming_count,
-        "total_bookings": total_count,
-        "last_booking_info": last_booking
-    }
+    now = datetime.utcnow()
+    row = (await db.execute(user_dashboard_query(user_id, now))).first()
+
+    if row is None:
+        dashboard = {
+            "past_bookings": 0,
+            "upcoming_bookings": 0,
+            "total_bookings": 0,
+            "last_booking_info": None
+        }
+    else:
+        last_booking = row.Booking
+        dashboard = {
+            "past_bookings": row.past_bookings,
+            "upcoming_bookings": row.upcoming_bookings,
+            "total_bookings": row.total_bookings,
+            "last_booking_info": {
+                "id": last_booking.id,
+                "slot_id": last_booking.slot_id,
+                "start_time": last_booking.start_time,
+                "end_time": last_booking.end_time,
+                "status": last_booking.status,
+                "price": last_booking.price
+            }
+        }
+
+    dashboard_cache.set(user_id, dashboard)
+    return dashboard
 
 # ------------------------------
 # Cancel booking
 # ------------------------------
 @router.delete("/{booking_id}", dependencies=[Depends(auth_utils.requires_role("user"))])
-def cancel_booking(
+async def cancel_booking(
     booking_id: int,
-    db: Session = Depends(db.get_db)
+    db: AsyncSession = Depends(db.get_db)
 ):
-    booking_obj = db.query(Booking).filter(Booking.id == booking_id).first()
+    booking_obj = await db.get(Booking, booking_id)
     if not booking_obj:
         raise HTTPException(status_code=404, detail="Booking not found")
 
     # Free up the slot
-    slot_obj = db.query(Slot).filter(Slot.id == booking_obj.slot_id).first()
+    slot_obj = await db.get(Slot, booking_obj.slot_id)
     if slot_obj:
-        slot_obj["status"] = SlotStatus.available
+        slot_obj.status = SlotStatus.available
 
     # Delete the booking
-    db.delete(booking_obj)
-    db.commit()
+    await db.delete(booking_obj)
+    await db.commit()
+    dashboard_cache.invalidate(booking_obj.user_id)
+    await row_cache.invalidate(slot_key(booking_obj.slot_id))
+    availability_index.cancel(booking_obj.slot_id, booking_id)
 
     return {"message": "Booking cancelled", "booking_id": booking_id}
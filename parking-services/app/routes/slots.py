@@ -1,10 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.models import schemas, models
 from app.database import db 
 from app.utils import auth_utils
+from app.utils.availability import availability_index, free_slots_query
+from app.utils.cache import row_cache, slot_key, slot_row, station_key
+from app.utils.pagination import PageSize, page, cursor_id
 from fastapi.responses import JSONResponse
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 router = APIRouter(
     prefix="/slots",
@@ -15,15 +21,15 @@ router = APIRouter(
 # CREATE SLOT (ADMIN ONLY)
 # ------------------------
 @router.post("/",response_model=List[schemas.SlotWithStationOut],dependencies=[Depends(auth_utils.requires_role("admin"))])
-def create_slot(
+async def create_slot(
     slot: schemas.SlotCreate,
-    db: Session = Depends(db.get_db),
+    db: AsyncSession = Depends(db.get_db),
     payload: dict = Depends(auth_utils.get_token_payload)
 ):
     admin_id = payload.get("id")
 
     # check that station exists
-    station = db.query(models.Parking).filter(models.Parking.id == slot.station_id).first()
+    station = await db.get(models.Parking, slot.station_id)
     print(station)
     if not station:
         raise HTTPException(
@@ -41,8 +47,10 @@ def create_slot(
         admin_id=admin_id)
     
     db.add(new_slot)
-    db.commit()
-    db.refresh(new_slot)
+    await db.commit()
+    await db.refresh(new_slot)
+    await row_cache.invalidate(station_key(slot.station_id), slot_key(new_slot.id))
+    availability_index.add_slot(new_slot)
     new_slot={"station":station}
     return new_slot
 
@@ -50,41 +58,103 @@ def create_slot(
 # ------------------------
 # GET AVAILABLE SLOTS (USER)
 # ------------------------
-@router.get("/",response_model=schemas.SlotShow, dependencies=[Depends(auth_utils.requires_role("user"))])
-def fetch_slot(
-    db: Session = Depends(db.get_db),
+@router.get("/", dependencies=[Depends(auth_utils.requires_role("user"))])
+async def fetch_slot(
+    db: AsyncSession = Depends(db.get_db),
     payload: dict = Depends(auth_utils.get_token_payload),
-    skip: int = 0,
-    limit: int = 10
+    station_id: Optional[int] = None,
+    slot_type: Optional[schemas.SlotType] = None,
+    slot_status: schemas.SlotStatus = schemas.SlotStatus.available,
+    cursor: Optional[str] = None,
+    limit: int = PageSize
 ):
-    slots = db.query(models.Slot).filter(models.Slot.status == True).offset(skip).limit(limit).all()
-    return slots
+    # keyset pagination on id: each page is an index range scan, however deep
+    query = select(models.Slot).filter(models.Slot.status == slot_status)
+    if station_id is not None:
+        query = query.filter(models.Slot.station_id == station_id)
+    if slot_type is not None:
+        query = query.filter(models.Slot.slot_type == slot_type)
+    if cursor:
+        query = query.filter(models.Slot.id > cursor_id(cursor))
+
+    result = await db.execute(query.order_by(models.Slot.id).limit(limit + 1))
+    slots = result.scalars().all()
+    return page(slots, limit, lambda slot: {"id": slot.id})
+
+
+# ------------------------
+# FREE SLOTS AT A STATION (USER), served from the in-memory availability index
+# ------------------------
+@router.get("/availability", dependencies=[Depends(auth_utils.requires_role("user"))])
+async def slot_availability(
+    station_id: int,
+    slot_type: Optional[schemas.SlotType] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    if start and end and end < start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must not be before start")
+    if availability_index.live:
+        return availability_index.free_slots(station_id, slot_type, start, end)
+
+    # index loading or its change feed is down: ask the database instead
+    now = datetime.utcnow()
+    start = start or now
+    async with db.SessionLocal() as session:
+        result = await session.execute(free_slots_query(station_id, slot_type, start, end or start, now))
+    return [dict(row) for row in result.mappings()]
+
+
+# ------------------------
+# CHECK AVAILABILITY INDEX AGAINST THE DATABASE (SUPERADMIN)
+# ------------------------
+@router.get("/availability/check", dependencies=[Depends(auth_utils.requires_role("superadmin"))])
+async def check_availability(
+    repair: bool = False,
+    db: AsyncSession = Depends(db.get_db)
+):
+    report = await availability_index.verify(db)
+    if repair and not report["consistent"]:
+        await availability_index.load(db)
+        report["repaired"] = True
+    return report
 
 
 # ------------------------
 # GET SLOT BY ID (USER)
 # ------------------------
 @router.get("/{id}", dependencies=[Depends(auth_utils.requires_role("user"))], response_model=schemas.SlotWithStationOut)
-def get_slot(
+async def get_slot(
     id: int,
-    db: Session = Depends(db.get_db),
+    db: AsyncSession = Depends(db.get_db),
     payload: dict = Depends(auth_utils.get_token_payload)
 ):
-    slot = db.query(models.Slot).filter(models.Slot.id == id).first()
+    cached = await row_cache.get(slot_key(id))
+    if cached is not None:
+        return cached
+
+    # eager-load the station: response_model nests it and async sessions cannot lazy load
+    slot = await db.scalar(
+        select(models.Slot).options(selectinload(models.Slot.station)).filter(models.Slot.id == id)
+    )
     if not slot:
         raise HTTPException(status_code=404, detail="Slot not found")
-    return slot
+
+    found_row = slot_row(slot)
+    await row_cache.set(slot_key(id), found_row)
+    return found_row
 
 
 # ------------------------
 # GET ALL SLOTS POSTED BY ADMIN (SUPERADMIN)
 # ------------------------
 @router.get("/-admin", dependencies=[Depends(auth_utils.requires_role("superadmin"))])
-def get_slots(
-    db: Session = Depends(db.get_db),
+async def get_slots(
+    db: AsyncSession = Depends(db.get_db),
     payload: dict = Depends(auth_utils.get_token_payload)
 ):
     user_id = payload.get("id")
 
-    slots = db.query(models.Slot).filter(models.Slot.admin_id == user_id).all()
+    result = await db.execute(select(models.Slot).filter(models.Slot.admin_id == user_id))
+    slots = result.scalars().all()
     return JSONResponse(status_code=status.HTTP_200_OK, content={"slots": [s.__dict__ for s in slots]})
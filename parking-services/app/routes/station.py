@@ -1,9 +1,15 @@
 from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from fastapi.responses import JSONResponse
+from typing import Any, Dict, Optional
 
 from app.database import db
 from app.utils import auth_utils
+from app.utils.availability import availability_index
+from app.utils.cache import row_cache, slot_key, station_key, station_row
+from app.utils.pagination import PageSize, cursor_id, page
 from app.models import schemas, models
 
 router = APIRouter(
@@ -18,20 +24,19 @@ router = APIRouter(
     dependencies=[Depends(auth_utils.requires_role("admin"))],
     response_model=schemas.StationOut
 )
-def add_station(
+async def add_station(
     station: schemas.StationIn,
-    db: Session = Depends(db.get_db),
+    db: AsyncSession = Depends(db.get_db),
     payload: dict = Depends(auth_utils.get_token_payload)
 ):
     try:
         user_id = payload.get("id")
 
         # Check if station already exists by name/location combo
-        station_exist = (
-            db.query(models.Parking)
+        station_exist = await db.scalar(
+            select(models.Parking)
             .filter(models.Parking.name == station.station_name,
                     models.Parking.location == station.location)
-            .first()
         )
         if station_exist:
             raise HTTPException(
@@ -41,10 +46,9 @@ def add_station(
             )
 
         # One admin → one station (enforced)
-        admin_exist = (
-            db.query(models.Parking)
+        admin_exist = await db.scalar(
+            select(models.Parking)
             .filter(models.Parking.admin_id == user_id)
-            .first()
         )
         if admin_exist:
             raise HTTPException(
@@ -61,8 +65,9 @@ def add_station(
             admin_id=user_id,
         )
         db.add(new_station)
-        db.commit()
-        db.refresh(new_station)
+        await db.commit()
+        await db.refresh(new_station)
+        await row_cache.invalidate(station_key(new_station.id))
 
         return new_station
 
@@ -79,17 +84,20 @@ def add_station(
     "/{station_id}",
     dependencies=[Depends(auth_utils.requires_role("superadmin"))]
 )
-def del_station(
+async def del_station(
     station_id: int,
-    db: Session = Depends(db.get_db),
+    db: AsyncSession = Depends(db.get_db),
     payload: dict = Depends(auth_utils.get_token_payload)
 ):
     try:
         user_id = payload.get("id")
 
-        station = db.query(models.Parking).filter(
-            models.Parking.id == station_id
-        ).first()
+        # slots/bookings are loaded up front so the ORM delete cascade runs without lazy loads
+        station = await db.scalar(
+            select(models.Parking)
+            .options(selectinload(models.Parking.slots).selectinload(models.Slot.bookings))
+            .filter(models.Parking.id == station_id)
+        )
 
         if not station:
             raise HTTPException(
@@ -105,8 +113,11 @@ def del_station(
                 detail="Admins can only delete their own stations"
             )
 
-        db.delete(station)
-        db.commit()
+        slot_ids = [slot.id for slot in station.slots]
+        await db.delete(station)
+        await db.commit()
+        await row_cache.invalidate(station_key(station_id), *(slot_key(slot_id) for slot_id in slot_ids))
+        availability_index.remove_station(station_id)
         return {"message": f"Station {station_id} deleted successfully"}
 
     except Exception:
@@ -115,21 +126,68 @@ def del_station(
             content={"message": "No posted station found"}
         )
 
+# ----------------------------
+# GET Stations with their available slots (Any role)
+# ----------------------------
+def station_with_slots_row(station: models.Parking) -> Dict[str, Any]:
+    available = [slot for slot in station.slots if slot.status == models.SlotStatus.available]
+    available.sort(key=lambda slot: slot.id)
+    return {
+        **station_row(station),
+        "total_slots": len(station.slots),
+        "available_slots": len(available),
+        "available_by_type": {
+            slot_type.value: sum(1 for slot in available if slot.slot_type == slot_type)
+            for slot_type in models.SlotType
+        },
+        "slots": [
+            {
+                "id": slot.id,
+                "slot_number": slot.slot_number,
+                "slot_type": slot.slot_type,
+                "price_per_hour": slot.price_per_hour,
+                "status": slot.status,
+            }
+            for slot in available
+        ],
+    }
+
+
+@router.get("/with-slots",
+    dependencies=[Depends(auth_utils.requires_role("user"))]
+)
+async def stations_with_slots(
+    db: AsyncSession = Depends(db.get_db),
+    cursor: Optional[str] = None,
+    limit: int = PageSize
+):
+    # one query for the page of stations plus one SELECT ... IN for all their slots,
+    # instead of a slots request per station
+    query = select(models.Parking).options(selectinload(models.Parking.slots))
+    if cursor:
+        query = query.filter(models.Parking.id > cursor_id(cursor))
+
+    result = await db.execute(query.order_by(models.Parking.id).limit(limit + 1))
+    stations = result.scalars().all()
+    return page(stations, limit, lambda station: {"id": station.id}, serialize=station_with_slots_row)
+
 # ----------------------------
 # GET Station by ID (Any role)
 # ----------------------------
 @router.get("/{station_id}",
     dependencies=[Depends(auth_utils.requires_role("user"))]
 )
-def get_station(
+async def get_station(
     station_id: int,
-    db: Session = Depends(db.get_db),
+    db: AsyncSession = Depends(db.get_db),
     payload: dict = Depends(auth_utils.get_token_payload)
 ):
     try:
-        found = db.query(models.Parking).filter(
-            models.Parking.id == station_id
-        ).first()
+        cached = await row_cache.get(station_key(station_id))
+        if cached is not None:
+            return cached
+
+        found = await db.get(models.Parking, station_id)
 
         if not found:
             return JSONResponse(
@@ -137,7 +195,9 @@ def get_station(
                 content={"message": "Station not found"}
             )
 
-        return found
+        found_row = station_row(found)
+        await row_cache.set(station_key(station_id), found_row)
+        return found_row
 
     except Exception:
         return JSONResponse(
@@ -1,19 +1,131 @@
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt,JWTError
-from fastapi import Depends,HTTPException,status
+from jose import jwk,jwt,JWTError
+from jose.exceptions import JWKError
+from fastapi import Depends,HTTPException,Request,status
 from app.core.config import settings
-from typing import Dict,Any
+from typing import Dict,Any,List,Optional
+import asyncio
+import base64
+import hashlib
+import hmac
+import httpx
+import json
+import logging
+import time
 
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://localhost:8000/login/")
+# claims already verified by the gateway, as "<base64url json>.<hex hmac-sha256>"
+def get_internal_claims(header:Optional[str])->Optional[Dict[str,Any]]:
+    if not header or not settings.INTERNAL_SIGNING_KEY or "." not in header:
+        return None
+    body, signature = header.rsplit(".", 1)
+    expected = hmac.new(settings.INTERNAL_SIGNING_KEY.encode(), body.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature, expected):
+        return None
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(body))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or claims.get("exp", 0) <= time.time():
+        return None
+    return claims
+
+# user service public keys by kid; refetched when stale, or early (rate-limited)
+# for an unknown kid after a key rotation; a failed fetch keeps the old keys
+class JWKSCache:
+    def __init__(self, url: str, ttl: float, min_refresh: float, timeout: float):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh = min_refresh
+        self.timeout = timeout
+        self._keys: Dict[str, Any] = {}
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _due(self, kid: str) -> bool:
+        age = time.monotonic() - self._checked_at
+        return age >= (self.ttl if kid in self._keys else self.min_refresh)
+
+    async def _refresh(self, kid: str):
+        async with self._lock:
+            if not self._due(kid):  # refreshed by another request meanwhile
+                return
+            self._checked_at = time.monotonic()
+            if self._client is None:
+                self._client = httpx.AsyncClient(timeout=self.timeout)
+            try:
+                response = await self._client.get(self.url)
+                response.raise_for_status()
+                self._keys = self._parse(response.json().get("keys", []))
+            except (httpx.HTTPError, ValueError, AttributeError) as e:
+                logger.warning("JWKS fetch from %s failed, keeping cached keys: %s", self.url, e)
+
+    @staticmethod
+    def _parse(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        keys = {}
+        for entry in entries:
+            if "kid" not in entry or entry.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[entry["kid"]] = jwk.construct(entry, entry.get("alg"))
+            except JWKError:
+                continue
+        return keys
+
+    async def get(self, kid: Optional[str]) -> Any:
+        if not kid:
+            raise JWTError("Token has no key id")
+        if self._due(kid):
+            await self._refresh(kid)
+        key = self._keys.get(kid)
+        if key is None:
+            raise JWTError("Unknown signing key")
+        return key
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+jwks_cache = JWKSCache(
+    url=settings.JWKS_URL,
+    ttl=settings.JWKS_CACHE_TTL,
+    min_refresh=settings.JWKS_MIN_REFRESH_INTERVAL,
+    timeout=settings.JWKS_TIMEOUT,
+)
+
+ACCEPTED_ALGORITHMS = [alg.strip() for alg in settings.ALGORITHMS.split(",") if alg.strip()]
+
+# verify a bearer token; the header only picks among the accepted algorithms
+async def decode_token(token:str)->Dict[str,Any]:
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+    if algorithm not in ACCEPTED_ALGORITHMS:
+        raise JWTError("Unsupported token algorithm")
+    if algorithm.startswith("HS"):
+        if not settings.SECRET_KEY:
+            raise JWTError("Shared-secret tokens are not accepted")
+        key = settings.SECRET_KEY
+    else:
+        key = await jwks_cache.get(header.get("kid"))
+    return jwt.decode(token, key, algorithms=[algorithm])
+
 #get token payload
-def get_token_payload(token:str=Depends(oauth2_scheme))->Dict[str,Any]:
+async def get_token_payload(request:Request,token:str=Depends(oauth2_scheme))->Dict[str,Any]:
     credential_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},)
+    # trust the gateway's signed claims and skip re-verifying the JWT
+    claims = get_internal_claims(request.headers.get("x-internal-claims"))
+    if claims is not None:
+        return claims
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHMS])
+        payload = await decode_token(token)
         return payload
     except JWTError:
         raise credential_exception
@@ -29,5 +141,16 @@ def requires_role(required_role: str):
         return payload
     return role_checker
 
+# role-checker dependency accepting any of several roles
+def requires_any_role(*roles: str):
+    def role_checker(payload: Dict[str, Any] = Depends(get_token_payload)):
+        if payload.get("role") not in roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to access this resource"
+            )
+        return payload
+    return role_checker
+
 
 
@@ -0,0 +1,350 @@
+import asyncio
+import bisect
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import DateTime, cast, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import models
+from app.models.models import AVAILABILITY_CHANNEL, SlotStatus, SlotType
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SlotEntry:
+    id: int
+    station_id: int
+    slot_number: str
+    slot_type: SlotType
+    status: SlotStatus
+    price_per_hour: int
+    # active bookings as (start, end, booking_id), sorted by start;
+    # the bookings_no_overlap constraint guarantees they never overlap
+    bookings: List[Tuple[datetime, datetime, int]] = field(default_factory=list)
+
+    def is_free(self, start: datetime, end: datetime, now: datetime) -> bool:
+        if self.status == SlotStatus.cancelled:
+            return False
+        # book_slot only claims slots whose status is available, and that status
+        # stays booked until the booking is cancelled; later windows are judged
+        # by the bookings alone
+        if start <= now and self.status != SlotStatus.available:
+            return False
+        # only the last booking starting before `end` can overlap [start, end);
+        # a point-in-time lookup (start == end) also counts bookings starting at that instant
+        key = (end,) if end > start else (end, datetime.max)
+        i = bisect.bisect_left(self.bookings, key) - 1
+        return i < 0 or self.bookings[i][1] <= start
+
+    def row(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "station_id": self.station_id,
+            "slot_number": self.slot_number,
+            "slot_type": self.slot_type,
+            "price_per_hour": self.price_per_hour,
+        }
+
+
+def free_slots_query(
+    station_id: int,
+    slot_type: Optional[SlotType],
+    start: datetime,
+    end: datetime,
+    now: datetime,
+):
+    """The database's answer to AvailabilityIndex.free_slots, used while the index is not live."""
+    period = func.tsrange(models.Booking.start_time, models.Booking.end_time)
+    overlapping = select(models.Booking.id).where(
+        models.Booking.slot_id == models.Slot.id,
+        models.Booking.status == SlotStatus.booked,
+        models.Booking.end_time > now,
+        # the same expression as bookings_no_overlap, so its gist index serves the lookup
+        # (typed point: `range @> unknown` would read the timestamp as a range)
+        period.op("&&")(func.tsrange(start, end)) if end > start else period.op("@>")(cast(start, DateTime)),
+    )
+    query = select(
+        models.Slot.id,
+        models.Slot.station_id,
+        models.Slot.slot_number,
+        models.Slot.slot_type,
+        models.Slot.price_per_hour,
+    ).filter(
+        models.Slot.station_id == station_id,
+        or_(models.Slot.status.is_(None), models.Slot.status != SlotStatus.cancelled),
+        ~overlapping.exists(),
+    )
+    if start <= now:
+        query = query.filter(or_(models.Slot.status.is_(None), models.Slot.status == SlotStatus.available))
+    if slot_type is not None:
+        query = query.filter(models.Slot.slot_type == slot_type)
+    return query.order_by(models.Slot.id)
+
+
+class AvailabilityIndex:
+    """In-process view of slot availability, keyed by station and slot type.
+
+    Every worker keeps its own copy. Triggers on slots and bookings publish the
+    id of each changed slot on the AVAILABILITY_CHANNEL at commit, whichever
+    worker, replica or tool wrote it; a listener reloads those slots from the
+    database. The index is only `live` while that listener is connected and
+    caught up; callers fall back to free_slots_query otherwise. Every
+    (re)connect reloads it in full, since notifications sent while no one was
+    listening are lost.
+    """
+
+    def __init__(self):
+        self._slots: Dict[int, SlotEntry] = {}
+        # station_id -> slot_type -> ids of slots that can be booked (not cancelled)
+        self._bookable: Dict[int, Dict[SlotType, Set[int]]] = {}
+        self.loaded_at: Optional[datetime] = None
+        self.live = False
+        self.reloads = 0
+        self.refreshed_slots = 0
+        self._listening = False
+        self._loading = False
+        self._pending: Set[int] = set()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._listen_task: Optional[asyncio.Task] = None
+        self._sessions: Optional[Callable[[], Any]] = None
+
+    # ---------------------------
+    # Loading and verification
+    # ---------------------------
+    @staticmethod
+    async def _snapshot(db: AsyncSession, slot_ids: Optional[Iterable[int]] = None) -> Dict[int, SlotEntry]:
+        now = datetime.utcnow()
+        slot_query = select(models.Slot)
+        booking_query = (
+            select(models.Booking.id, models.Booking.slot_id, models.Booking.start_time, models.Booking.end_time)
+            .filter(models.Booking.status == SlotStatus.booked, models.Booking.end_time > now)
+            .order_by(models.Booking.start_time)
+        )
+        if slot_ids is not None:
+            slot_ids = list(slot_ids)
+            slot_query = slot_query.filter(models.Slot.id.in_(slot_ids))
+            booking_query = booking_query.filter(models.Booking.slot_id.in_(slot_ids))
+        slots = (await db.execute(slot_query)).scalars().all()
+        entries = {
+            slot.id: SlotEntry(
+                id=slot.id,
+                station_id=slot.station_id,
+                slot_number=slot.slot_number,
+                slot_type=SlotType(slot.slot_type),
+                status=SlotStatus(slot.status or SlotStatus.available),
+                price_per_hour=slot.price_per_hour,
+            )
+            for slot in slots
+        }
+        for booking_id, slot_id, start_time, end_time in await db.execute(booking_query):
+            if slot_id in entries:
+                entries[slot_id].bookings.append((start_time, end_time, booking_id))
+        return entries
+
+    async def load(self, db: AsyncSession):
+        self._slots = await self._snapshot(db)
+        self._bookable = {}
+        for entry in self._slots.values():
+            self._index(entry)
+        self.loaded_at = datetime.utcnow()
+        self.reloads += 1
+
+    async def verify(self, db: AsyncSession) -> Dict[str, Any]:
+        """Compare the index against the database and report slots that drifted."""
+        fresh = await self._snapshot(db)
+        now = datetime.utcnow()
+        mismatched = []
+        for slot_id in self._slots.keys() | fresh.keys():
+            ours, theirs = self._slots.get(slot_id), fresh.get(slot_id)
+            if ours is None or theirs is None:
+                mismatched.append(slot_id)
+                continue
+            ours_bookings = [b for b in ours.bookings if b[1] > now]
+            if (ours.status, ours.station_id, ours.slot_type, ours_bookings) != (
+                theirs.status, theirs.station_id, theirs.slot_type, theirs.bookings
+            ):
+                mismatched.append(slot_id)
+        return {
+            "consistent": not mismatched,
+            "mismatched_slots": sorted(mismatched),
+            "indexed_slots": len(self._slots),
+            "database_slots": len(fresh),
+            "loaded_at": self.loaded_at,
+            "live": self.live,
+        }
+
+    # ---------------------------
+    # Keeping every worker current
+    # ---------------------------
+    def start(self, connect: Callable[[], Awaitable[Any]], sessions: Callable[[], Any], check_interval: float = 30.0):
+        """Listen for slot changes on a dedicated connection from `connect()` (asyncpg) and load the index."""
+        self._sessions = sessions
+        self._listen_task = asyncio.get_running_loop().create_task(self._listen(connect, check_interval))
+
+    async def stop(self):
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            await asyncio.gather(self._listen_task, return_exceptions=True)
+            self._listen_task = None
+        await self._cancel_refresh()
+        self.live = self._listening = False
+
+    async def _listen(self, connect: Callable[[], Awaitable[Any]], check_interval: float):
+        delay = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await connect()
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                # listening first, then loading: a change committed in between is
+                # queued and refreshed after the load, so the older snapshot
+                # cannot overwrite it
+                await self._cancel_refresh()
+                self._pending.clear()
+                self._loading = True
+                await conn.add_listener(AVAILABILITY_CHANNEL, self._on_notify)
+                async with self._sessions() as db:
+                    await self.load(db)
+                self._loading = False
+                self._listening = True
+                self.live = True
+                self._schedule_refresh()
+                delay = 1.0
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), timeout=check_interval)
+                    except asyncio.TimeoutError:
+                        # a silently dropped connection would never report itself
+                        await asyncio.wait_for(conn.execute("SELECT 1"), timeout=check_interval)
+                logger.warning("availability listener connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("availability listener failed, retrying in %.0fs: %s", delay, e)
+            finally:
+                self._listening = self._loading = False
+                self.live = False
+                if conn is not None and not conn.is_closed():
+                    conn.terminate()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _on_notify(self, connection: Any, pid: int, channel: str, payload: str):
+        self._pending.add(int(payload))
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self._pending and not self._loading and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+
+    async def _cancel_refresh(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+    async def _refresh(self):
+        while self._pending:
+            slot_ids, self._pending = self._pending, set()
+            try:
+                async with self._sessions() as db:
+                    fresh = await self._snapshot(db, slot_ids)
+            except Exception as e:
+                # serve from the database until these slots are current again
+                self._pending |= slot_ids
+                self.live = False
+                logger.warning("availability refresh failed, retrying: %s", e)
+                await asyncio.sleep(1.0)
+                continue
+            for slot_id in slot_ids:
+                self._replace(slot_id, fresh.get(slot_id))
+            self.refreshed_slots += len(slot_ids)
+            self.live = self._listening
+
+    # ---------------------------
+    # Updates
+    # ---------------------------
+    def _index(self, entry: SlotEntry):
+        if entry.status != SlotStatus.cancelled:
+            self._bookable.setdefault(entry.station_id, {}).setdefault(entry.slot_type, set()).add(entry.id)
+
+    def _unindex(self, entry: SlotEntry):
+        self._bookable.get(entry.station_id, {}).get(entry.slot_type, set()).discard(entry.id)
+
+    def _replace(self, slot_id: int, entry: Optional[SlotEntry]):
+        old = self._slots.pop(slot_id, None)
+        if old is not None:
+            self._unindex(old)
+        if entry is not None:
+            self._slots[slot_id] = entry
+            self._index(entry)
+
+    # The routes apply their own writes right away so this worker reads them
+    # back at once; the notification that follows reloads the same slots.
+    def add_slot(self, slot: models.Slot):
+        self._replace(slot.id, SlotEntry(  # type: ignore[arg-type]
+            id=slot.id,  # type: ignore[arg-type]
+            station_id=slot.station_id,  # type: ignore[arg-type]
+            slot_number=slot.slot_number,  # type: ignore[arg-type]
+            slot_type=SlotType(slot.slot_type),
+            status=SlotStatus(slot.status or SlotStatus.available),
+            price_per_hour=slot.price_per_hour,  # type: ignore[arg-type]
+        ))
+
+    def remove_station(self, station_id: int):
+        for slot_id in [s.id for s in self._slots.values() if s.station_id == station_id]:
+            self._replace(slot_id, None)
+        self._bookable.pop(station_id, None)
+
+    def book(self, slot_id: int, booking_id: int, start: datetime, end: datetime):
+        entry = self._slots.get(slot_id)
+        if entry is None:
+            return
+        entry.status = SlotStatus.booked
+        bisect.insort(entry.bookings, (start, end, booking_id))
+
+    def cancel(self, slot_id: int, booking_id: int):
+        entry = self._slots.get(slot_id)
+        if entry is None:
+            return
+        entry.bookings = [b for b in entry.bookings if b[2] != booking_id]
+        entry.status = SlotStatus.available
+
+    # ---------------------------
+    # Queries
+    # ---------------------------
+    def free_slots(
+        self,
+        station_id: int,
+        slot_type: Optional[SlotType] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        now: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """Free slots at a station, optionally of one type, for the window [start, end)."""
+        now = now or datetime.utcnow()
+        start = start or now
+        end = end or start
+        by_type = self._bookable.get(station_id, {})
+        candidate_ids = by_type.get(SlotType(slot_type), set()) if slot_type else set().union(*by_type.values())
+        free = [
+            self._slots[slot_id].row() for slot_id in candidate_ids
+            if self._slots[slot_id].is_free(start, end, now)
+        ]
+        free.sort(key=lambda s: s["id"])
+        return free
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "live": self.live,
+            "indexed_slots": len(self._slots),
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "refreshed_slots": self.refreshed_slots,
+        }
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,185 @@
+import json
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+from app.models import models
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis is optional, the local stand-in is used without it
+    redis = None
+
+
+# in-process cache with a per-entry time to live
+class TTLCache:
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# user dashboards, keyed by user id; dropped on book/cancel
+dashboard_cache = TTLCache(ttl=settings.DASHBOARD_CACHE_TTL)
+
+
+# ---------------------------
+# Row cache backends
+# ---------------------------
+class LocalCacheBackend:
+    """Process-local stand-in for Redis, used in tests and when REDIS_URL is unset."""
+
+    def __init__(self):
+        self._entries = TTLCache(ttl=0)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: str, ttl: int):
+        self._entries.set(key, value, ttl)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.invalidate(key)
+
+    async def close(self):
+        self._entries.clear()
+
+
+class RedisCacheBackend:
+    def __init__(self, url: str):
+        self._client = redis.from_url(url, decode_responses=True)  # type: ignore[union-attr]
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str, ttl: int):
+        await self._client.set(key, value, ex=ttl)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._client.delete(*keys)
+
+    async def close(self):
+        await self._client.aclose()
+
+
+# read-through cache of serialized rows; a failing backend degrades to a miss
+class RowCache:
+    def __init__(self, backend, ttl: int, prefix: str = "parking"):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await self.backend.get(self._key(key))
+        except Exception:
+            self.errors += 1
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        if self.ttl <= 0:
+            return
+        try:
+            await self.backend.set(self._key(key), json.dumps(jsonable_encoder(value)), self.ttl)
+        except Exception:
+            self.errors += 1
+
+    async def invalidate(self, *keys: str):
+        try:
+            await self.backend.delete(*(self._key(key) for key in keys))
+        except Exception:
+            self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _make_backend():
+    if settings.REDIS_URL:
+        if redis is not None:
+            return RedisCacheBackend(settings.REDIS_URL)
+        print("REDIS_URL is set but the redis package is not installed, using local cache")
+    return LocalCacheBackend()
+
+
+row_cache = RowCache(backend=_make_backend(), ttl=settings.CACHE_TTL)
+
+
+# ---------------------------
+# Cache keys and row serializers
+# ---------------------------
+def station_key(station_id: int) -> str:
+    return f"station:{station_id}"
+
+def slot_key(slot_id: int) -> str:
+    return f"slot:{slot_id}"
+
+def station_row(station: models.Parking) -> Dict[str, Any]:
+    return {
+        "id": station.id,
+        "name": station.name,
+        "location": station.location,
+        "capacity": station.capacity,
+        "created_at": station.created_at,
+        "admin_id": station.admin_id,
+    }
+
+# shaped like schemas.SlotWithStationOut
+def slot_row(slot: models.Slot) -> Dict[str, Any]:
+    return {
+        "id": slot.id,
+        "station_id": slot.station_id,
+        "slot_number": slot.slot_number,
+        "slot_type": slot.slot_type,
+        "status": slot.status,
+        "price_per_hour": slot.price_per_hour,
+        "created_at": slot.created_at,
+        "admin_id": slot.admin_id,
+        "station": {
+            "station_id": str(slot.station.id),
+            "station_name": slot.station.name,
+            "location": slot.station.location,
+            "capacity": slot.station.capacity,
+        },
+    }
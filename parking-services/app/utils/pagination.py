@@ -0,0 +1,68 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+from fastapi import HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import tuple_
+from app.models.models import Booking
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# page size query parameter, capped server side
+PageSize = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+
+
+# opaque keyset cursors: base64url encoded JSON of the last row's sort key
+def encode_cursor(values: Dict[str, Any]) -> str:
+    raw = json.dumps(jsonable_encoder(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+# plain dict of a row's table columns
+def row_dict(row: Any) -> Dict[str, Any]:
+    return {column.key: getattr(row, column.key) for column in row.__table__.columns}
+
+def page(rows: Sequence[Any], limit: int, cursor_of, serialize=row_dict) -> Dict[str, Any]:
+    """Build a page from `limit + 1` fetched rows; the extra row only signals a next page."""
+    items: List[Any] = list(rows[:limit])
+    next_cursor: Optional[str] = encode_cursor(cursor_of(items[-1])) if len(rows) > limit else None
+    return {
+        "items": [serialize(row) for row in items],
+        "next_cursor": next_cursor,
+        "limit": limit,
+    }
+
+
+# ---------------------------
+# Booking keyset, newest first on (start_time, id)
+# ---------------------------
+def booking_cursor(booking: Booking) -> Dict[str, Any]:
+    return {"start_time": booking.start_time, "id": booking.id}
+
+def after_booking_cursor(cursor: str):
+    values = decode_cursor(cursor)
+    try:
+        start_time = datetime.fromisoformat(values["start_time"])
+        booking_id = int(values["id"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return tuple_(Booking.start_time, Booking.id) < tuple_(start_time, booking_id)
+
+# keyset on id alone (slots, stations)
+def cursor_id(cursor: str) -> int:
+    try:
+        return int(decode_cursor(cursor)["id"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
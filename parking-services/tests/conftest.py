@@ -0,0 +1,56 @@
+import os
+import uuid
+from contextlib import asynccontextmanager
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+# app.core.config reads these at import time; the tests never use them to connect
+for name, value in {
+    "DB_HOSTNAME": "localhost", "DB_PORT": "5432", "DB_PASSWORD": "password",
+    "DB_NAME": "parking", "DB_USERNAME": "postgres", "ALGORITHMS": "HS256", "SECRET_KEY": "test-secret",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture(scope="module")
+def pg_engine():
+    """Sync engine on a throwaway schema of DATABASE_URL; skips the test module without one."""
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url:
+        pytest.skip("DATABASE_URL is not set")
+    from app.database.db import Base
+    import app.models.models  # noqa: F401  registers the tables
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    url = make_url(database_url).set(drivername="postgresql+psycopg2")
+    admin = create_engine(url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+        conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+    # public stays on the path for the btree_gist operator classes
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={schema},public"})
+    Base.metadata.create_all(engine)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+        admin.dispose()
+
+
+@asynccontextmanager
+async def async_sessions(engine):
+    """Sessions as the app makes them (asyncpg), on the schema of a pg_engine."""
+    with engine.connect() as conn:
+        schema = conn.execute(text("SELECT current_schema()")).scalar()
+    async_engine = create_async_engine(
+        make_url(os.environ["DATABASE_URL"]).set(drivername="postgresql+asyncpg"),
+        connect_args={"server_settings": {"search_path": f"{schema},public"}},
+    )
+    try:
+        yield async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        await async_engine.dispose()
@@ -0,0 +1,154 @@
+"""Availability index against a real Postgres: window answers and cross-worker freshness.
+
+Runs against DATABASE_URL (skipped without it) on a throwaway schema. Writes go
+through a separate connection, as another worker or replica would make them.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import asyncpg
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from app.models.models import SlotType
+from app.utils.availability import AvailabilityIndex, free_slots_query
+from tests.conftest import async_sessions
+
+NOW = datetime.utcnow().replace(microsecond=0)
+HOUR = timedelta(hours=1)
+
+# slot 4 is booked right now, slot 5 is taken out of service, slot 6 has a booking later on
+SEED = [
+    "INSERT INTO station (id, name, location, capacity, created_at, admin_id) VALUES (1, 'north', 'city', 10, now(), 1)",
+    """
+    INSERT INTO slots (id, station_id, slot_number, slot_type, status, price_per_hour, created_at, admin_id) VALUES
+        (1, 1, 'A1', 'car', 'available', 10, now(), 1),
+        (2, 1, 'A2', 'car', 'available', 10, now(), 1),
+        (3, 1, 'E1', 'ev', 'available', 15, now(), 1),
+        (4, 1, 'A4', 'car', 'booked', 10, now(), 1),
+        (5, 1, 'A5', 'car', 'cancelled', 10, now(), 1),
+        (6, 1, 'A6', 'car', 'available', 10, now(), 1)
+    """,
+    """
+    INSERT INTO bookings (user_id, slot_id, start_time, end_time, status, price, created_at) VALUES
+        (7, 4, :now - interval '30 minutes', :now + interval '30 minutes', 'booked', 10, now()),
+        (8, 6, :now + interval '2 hours', :now + interval '3 hours', 'booked', 10, now()),
+        (9, 2, :now - interval '3 hours', :now - interval '2 hours', 'booked', 10, now())
+    """,
+]
+
+WINDOWS = [
+    (NOW, NOW),
+    (NOW, NOW + HOUR),
+    (NOW + 2 * HOUR, NOW + 3 * HOUR),
+    (NOW + 2.5 * HOUR, NOW + 2.5 * HOUR),
+    (NOW + 3 * HOUR, NOW + 4 * HOUR),
+    (NOW + 1.5 * HOUR, NOW + 2.25 * HOUR),
+]
+
+
+@pytest.fixture(scope="module")
+def seeded(pg_engine):
+    with pg_engine.begin() as conn:
+        for statement in SEED:
+            conn.execute(text(statement), {"now": NOW})
+    return pg_engine
+
+
+def write(engine, *statements):
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement), {"now": NOW})
+
+
+async def wait_until(predicate, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("timed out waiting for the availability index")
+        await asyncio.sleep(0.01)
+
+
+@asynccontextmanager
+async def running_index(engine):
+    """An index kept current the way the app keeps it, on the engine's schema."""
+    url = make_url(os.environ["DATABASE_URL"]).set(drivername="postgresql")
+    async with async_sessions(engine) as sessions:
+        index = AvailabilityIndex()
+        index.start(lambda: asyncpg.connect(url.render_as_string(hide_password=False)), sessions)
+        try:
+            await wait_until(lambda: index.live)
+            yield index, sessions
+        finally:
+            await index.stop()
+
+
+def free_ids(index, start=None, end=None, slot_type=None):
+    return [slot["id"] for slot in index.free_slots(1, slot_type, start, end, now=NOW)]
+
+
+def test_window_answers_match_the_database(seeded):
+    async def run():
+        async with running_index(seeded) as (index, sessions):
+            async with sessions() as db:
+                for start, end in WINDOWS:
+                    for slot_type in (None, SlotType.car):
+                        rows = (await db.execute(free_slots_query(1, slot_type, start, end, NOW))).mappings().all()
+                        assert free_ids(index, start, end, slot_type) == [row["id"] for row in rows], (start, end)
+                assert (await index.verify(db))["consistent"]
+            return index
+
+    index = asyncio.run(run())
+    # booked now, free once its booking is over; never the cancelled slot
+    assert free_ids(index) == [1, 2, 3, 6]
+    assert free_ids(index, NOW + 2 * HOUR, NOW + 3 * HOUR) == [1, 2, 3, 4]
+    assert free_ids(index, NOW + 3 * HOUR, NOW + 4 * HOUR) == [1, 2, 3, 4, 6]
+    assert free_ids(index, slot_type=SlotType.ev) == [3]
+
+
+def test_writes_from_another_worker_reach_the_index(seeded):
+    async def run():
+        async with running_index(seeded) as (index, _):
+            # another worker books slot 1 the way book_slot does
+            write(
+                seeded,
+                "UPDATE slots SET status = 'booked' WHERE id = 1",
+                "INSERT INTO bookings (user_id, slot_id, start_time, end_time, status, price, created_at) "
+                "VALUES (10, 1, :now, :now + interval '1 hour', 'booked', 10, now())",
+            )
+            await wait_until(lambda: 1 not in free_ids(index))
+            assert 1 not in free_ids(index, NOW + 0.5 * HOUR, NOW + 0.75 * HOUR)
+            assert 1 in free_ids(index, NOW + HOUR, NOW + 2 * HOUR)
+
+            # ... and cancels it again
+            write(seeded, "DELETE FROM bookings WHERE user_id = 10", "UPDATE slots SET status = 'available' WHERE id = 1")
+            await wait_until(lambda: 1 in free_ids(index))
+
+            # a slot added elsewhere shows up, and goes away with its station's slots
+            write(seeded, "INSERT INTO slots (id, station_id, slot_number, slot_type, status, price_per_hour, created_at, admin_id) "
+                          "VALUES (7, 1, 'E2', 'ev', 'available', 15, now(), 1)")
+            await wait_until(lambda: free_ids(index, slot_type=SlotType.ev) == [3, 7])
+            write(seeded, "DELETE FROM slots WHERE id = 7")
+            await wait_until(lambda: free_ids(index, slot_type=SlotType.ev) == [3])
+
+    asyncio.run(run())
+
+
+def test_reconnect_reloads_changes_missed_while_disconnected(seeded):
+    async def run():
+        async with running_index(seeded) as (index, _):
+            write(seeded, "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                          "WHERE pid <> pg_backend_pid() AND query LIKE 'LISTEN%'")
+            await wait_until(lambda: not index.live)
+            # nobody is listening, so this change is never notified
+            write(seeded, "UPDATE slots SET status = 'cancelled' WHERE id = 3")
+            try:
+                await wait_until(lambda: index.live, timeout=10)
+                assert index.reloads == 2
+                assert free_ids(index, slot_type=SlotType.ev) == []
+            finally:
+                write(seeded, "UPDATE slots SET status = 'available' WHERE id = 3")
+            await wait_until(lambda: free_ids(index, slot_type=SlotType.ev) == [3])
+
+    asyncio.run(run())
@@ -0,0 +1,48 @@
+"""book_slot's handling of integrity errors, against a real Postgres (skipped without DATABASE_URL)."""
+import asyncio
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from app.models.schemas import BookSlot
+from app.routes.bookings import book_slot
+from tests.conftest import async_sessions
+
+# A1 is available but already has a booking starting in 30 minutes
+SEED = [
+    "INSERT INTO station (id, name, location, capacity, created_at, admin_id) VALUES (1, 'north', 'city', 10, now(), 1)",
+    "INSERT INTO slots (id, station_id, slot_number, slot_type, status, price_per_hour, created_at, admin_id) "
+    "VALUES (1, 1, 'A1', 'car', 'available', 10, now(), 1)",
+    "INSERT INTO bookings (user_id, slot_id, start_time, end_time, status, price, created_at) "
+    "VALUES (7, 1, (now() at time zone 'utc') + interval '30 minutes', (now() at time zone 'utc') + interval '2 hours', 'booked', 10, now())",
+]
+
+
+@pytest.fixture(scope="module")
+def seeded(pg_engine):
+    with pg_engine.begin() as conn:
+        for statement in SEED:
+            conn.execute(text(statement))
+    return pg_engine
+
+
+def book(engine, user_id):
+    async def run():
+        async with async_sessions(engine) as sessions:
+            async with sessions() as db:
+                return await book_slot(BookSlot(station_id=1, slot_number="A1", duration=1), {"id": user_id}, db)
+
+    return asyncio.run(run())
+
+
+def test_overlapping_booking_is_a_conflict(seeded):
+    with pytest.raises(HTTPException) as raised:
+        book(seeded, 8)
+    assert raised.value.status_code == 409
+
+
+def test_other_integrity_errors_are_not_reported_as_conflicts(seeded):
+    # a token without a user id: bookings.user_id is NOT NULL
+    with pytest.raises(IntegrityError) as raised:
+        book(seeded, None)
+    assert raised.value.orig.pgcode == "23502"
@@ -0,0 +1,55 @@
+"""Connection pool metrics: lazy checkout per request, wait and hold times from the pool itself."""
+import asyncio
+import os
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.database import db
+
+
+def test_get_db_does_not_check_out_a_connection_up_front():
+    async def run():
+        dependency = db.get_db()
+        session = await dependency.__anext__()
+        try:
+            assert db.engine.pool.checkedout() == 0  # type: ignore[attr-defined]
+            assert not session.in_transaction()
+        finally:
+            await dependency.aclose()
+
+    asyncio.run(run())
+
+
+def test_pool_records_checkout_wait_and_hold_time():
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url:
+        pytest.skip("DATABASE_URL is not set")
+    engine = create_async_engine(
+        make_url(database_url).set(drivername="postgresql+asyncpg"),
+        poolclass=db.TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    event.listen(engine.sync_engine, "checkout", db._on_checkout)
+    event.listen(engine.sync_engine, "checkin", db._on_checkin)
+    before = dict(db.pool_metrics)
+
+    async def hold(seconds: float):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await asyncio.sleep(seconds)
+
+    async def run():
+        first = asyncio.create_task(hold(0.3))
+        await asyncio.sleep(0.05)
+        # the only connection is held by the first task, so this one queues for it
+        await hold(0)
+        await first
+        await engine.dispose()
+
+    asyncio.run(run())
+    assert db.pool_metrics["wait_count"] - before["wait_count"] == 2
+    assert db.pool_metrics["wait_time_max_ms"] >= 150
+    assert db.pool_metrics["checkins"] - before["checkins"] == 2
+    assert db.pool_metrics["hold_time_max_ms"] >= 300
@@ -0,0 +1,98 @@
+"""EXPLAIN-based checks that the hot booking/slot queries stay on their indexes.
+
+The statements come from the same builders the routes execute. Runs against
+DATABASE_URL (skipped without it) on a seeded throwaway schema.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Set
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from app.models.schemas import BookSlot
+from app.routes.admin_booking import dashboard_query
+from app.routes.bookings import booking_insert, history_query, user_dashboard_query
+from app.utils.availability import free_slots_query
+from app.utils.pagination import DEFAULT_PAGE_SIZE, encode_cursor
+
+# one admin per station, as admin_booking expects; stations 21+ have no slots yet
+SEED = """
+INSERT INTO station (id, name, location, capacity, created_at, admin_id)
+SELECT s, 'station ' || s, 'city ' || (s % 5), 100, now(), s
+FROM generate_series(1, 1000) AS s;
+
+INSERT INTO slots (id, station_id, slot_number, slot_type, status, price_per_hour, created_at, admin_id)
+SELECT n, 1 + (n - 1) / 100, 'S' || n, (ARRAY['car', 'bike', 'ev'])[1 + n % 3]::slottype,
+       (CASE WHEN n % 4 = 0 THEN 'booked' ELSE 'available' END)::slotstatus, 10 + n % 5, now(), 1
+FROM generate_series(1, 2000) AS n;
+
+-- 50 back-to-back bookings per slot, so active bookings of a slot never overlap
+INSERT INTO bookings (user_id, slot_id, start_time, end_time, status, price, created_at)
+SELECT 1 + (s * 50 + k) % 5000, s,
+       timestamp '2026-01-01' + k * interval '2 hours',
+       timestamp '2026-01-01' + k * interval '2 hours' + interval '1 hour',
+       (CASE WHEN k % 5 = 0 THEN 'cancelled' ELSE 'booked' END)::slotstatus, 10, now()
+FROM generate_series(1, 2000) AS s, generate_series(0, 49) AS k;
+"""
+
+NOW = datetime(2026, 1, 3)
+
+
+@pytest.fixture(scope="module")
+def seeded(pg_engine):
+    with pg_engine.begin() as conn:
+        conn.execute(text(SEED))
+        conn.execute(text("ANALYZE"))
+    return pg_engine
+
+
+def plan_nodes(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def indexes_used(engine, statement) -> Set[str]:
+    sql = statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return {node["Index Name"] for node in plan_nodes(plan[0]["Plan"]) if "Index Name" in node}
+
+
+def test_booking_history_uses_user_start_time_index(seeded):
+    first_page = history_query(42, DEFAULT_PAGE_SIZE)
+    next_page = history_query(42, DEFAULT_PAGE_SIZE, cursor=encode_cursor({"start_time": NOW, "id": 5}))
+    assert "ix_bookings_user_id_start_time" in indexes_used(seeded, first_page)
+    assert "ix_bookings_user_id_start_time" in indexes_used(seeded, next_page)
+
+
+def test_user_dashboard_uses_user_start_time_index(seeded):
+    assert "ix_bookings_user_id_start_time" in indexes_used(seeded, user_dashboard_query(42, NOW))
+
+
+def test_admin_dashboard_finds_station_and_slots_by_index(seeded):
+    assert {"ix_station_admin_id", "ix_slots_station_id_status"} <= indexes_used(seeded, dashboard_query(2, NOW))
+
+
+def test_slot_claim_uses_station_status_index(seeded):
+    booking = BookSlot(station_id=7, slot_number="S650", duration=2)
+    assert "ix_slots_station_id_status" in indexes_used(seeded, booking_insert(42, booking, NOW, NOW + timedelta(hours=2)))
+
+
+@pytest.mark.parametrize("start, end", [(NOW + timedelta(hours=1), NOW + timedelta(hours=3)), (NOW, NOW)])
+def test_free_slots_overlap_lookup_uses_exclusion_index(seeded, start, end):
+    # the fallback for /slots/availability while the in-memory index is not live
+    used = indexes_used(seeded, free_slots_query(7, None, start, end, NOW))
+    assert {"ix_slots_station_id_status", "bookings_no_overlap"} <= used
+
+
+def test_exclusion_constraint_is_backed_by_its_gist_index(seeded):
+    with seeded.connect() as conn:
+        index = conn.execute(text(
+            "SELECT i.relname, am.amname FROM pg_constraint c "
+            "JOIN pg_class i ON i.oid = c.conindid JOIN pg_am am ON am.oid = i.relam "
+            "WHERE c.conname = 'bookings_no_overlap' AND c.connamespace = current_schema()::regnamespace"
+        )).one()
+    assert tuple(index) == ("bookings_no_overlap", "gist")
@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,8 +8,42 @@ class Settings(BaseSettings):
     DB_NAME: str = "mydb"
     DB_USERNAME: str = "user"
     SECRET_KEY: str = "supersecretkey"
-    ALGORITHMS: str = "HS256"
+    # RS256/ES256 sign with a private key and publish the public keys at
+    # /.well-known/jwks.json; HS256 falls back to the shared SECRET_KEY
+    ALGORITHMS: str = "RS256"
     ACCESS_TOKEN_EXPIRATION_TIME: int = 30
+    # PEM, inline or as a file; required for RS*/ES*, shared by all workers and replicas
+    JWT_PRIVATE_KEY: Optional[str] = None
+    JWT_PRIVATE_KEY_FILE: Optional[str] = None
+    # defaults to the key's RFC 7638 thumbprint
+    JWT_KEY_ID: Optional[str] = None
+    # public keys of retired signing keys, kept in the JWKS while their tokens are still valid
+    JWT_PREVIOUS_PUBLIC_KEYS: List[str] = []
+    # refresh tokens are opaque and rotate on every use; minutes (7 days)
+    REFRESH_TOKEN_EXPIRATION_TIME: int = 10080
+    # refresh token store and login negative cache; process-local stand-ins are used when unset
+    REDIS_URL: Optional[str] = None
+
+    # connection pool tuning (per replica)
+    DB_ECHO: bool = False
+    # no overflow: overflow connections are closed on checkin and reopened under load,
+    # which stretches the p99 (see user-services/scripts/bench_db_engine.py)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 0
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 5000
+
+    # bcrypt worker pool; calls beyond PASSWORD_HASH_MAX_PENDING get a 503
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    # how long a login with an unknown email is rejected without a database lookup;
+    # shared through REDIS_URL when set, otherwise per worker, so a signup on one
+    # worker can be refused a login on another for up to this many seconds
+    LOGIN_NEGATIVE_CACHE_TTL: int = 5
+    LOGIN_NEGATIVE_CACHE_SIZE: int = 10000
 
     model_config = {
         "env_file": ".env",
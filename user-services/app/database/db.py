@@ -1,25 +1,97 @@
 #   -----RELATIONAL DATABASE-------
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.configs import settings
 
-# -----POSTGRE SQL database------------
-SQLALCHEMY_DATABASE_URL = f"postgresql+psycopg2://{settings.DB_USERNAME}:{settings.DB_PASSWORD}@{settings.DB_HOSTNAME}:{settings.DB_PORT}/{settings.DB_NAME}"
-
-engine=create_engine(SQLALCHEMY_DATABASE_URL,echo=True)
-
-SessionLocal=sessionmaker(autocommit=False,autoflush=False,bind=engine)
+# -----connection pool metrics------------
+pool_metrics = {
+    "connects": 0,
+    "checkouts": 0,
+    "checkins": 0,
+    "wait_count": 0,
+    "wait_time_total_ms": 0.0,
+    "wait_time_max_ms": 0.0,
+    "hold_time_total_ms": 0.0,
+    "hold_time_max_ms": 0.0,
+}
+
+def record_pool_wait(seconds: float):
+    waited_ms = seconds * 1000
+    pool_metrics["wait_count"] += 1
+    pool_metrics["wait_time_total_ms"] += waited_ms
+    pool_metrics["wait_time_max_ms"] = max(pool_metrics["wait_time_max_ms"], waited_ms)
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record_pool_wait(time.perf_counter() - started)
+
+# -----POSTGRE SQL database (asyncpg)------------
+SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{settings.DB_USERNAME}:{settings.DB_PASSWORD}@{settings.DB_HOSTNAME}:{settings.DB_PORT}/{settings.DB_NAME}"
+
+engine=create_async_engine(
+    SQLALCHEMY_DATABASE_URL,
+    echo=settings.DB_ECHO,
+    poolclass=TimedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}},
+)
+
+# expire_on_commit=False so committed rows can still be serialized without a lazy reload
+SessionLocal=async_sessionmaker(bind=engine,class_=AsyncSession,autoflush=False,expire_on_commit=False)
 
 Base = declarative_base()
 
+@event.listens_for(engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics["connects"] += 1
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_metrics["checkouts"] += 1
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_metrics["checkins"] += 1
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        held_ms = (time.perf_counter() - checked_out_at) * 1000
+        pool_metrics["hold_time_total_ms"] += held_ms
+        pool_metrics["hold_time_max_ms"] = max(pool_metrics["hold_time_max_ms"], held_ms)
+
+def get_pool_stats():
+    pool = engine.pool
+    wait_count = pool_metrics["wait_count"]
+    checkins = pool_metrics["checkins"]
+    return {
+        "size": pool.size(),  # type: ignore[attr-defined]
+        "checked_out": pool.checkedout(),  # type: ignore[attr-defined]
+        "checked_in": pool.checkedin(),  # type: ignore[attr-defined]
+        "overflow": pool.overflow(),  # type: ignore[attr-defined]
+        **pool_metrics,
+        "wait_time_avg_ms": pool_metrics["wait_time_total_ms"] / wait_count if wait_count else 0.0,
+        "hold_time_avg_ms": pool_metrics["hold_time_total_ms"] / checkins if checkins else 0.0,
+    }
+
 #dependencies
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    # the session checks a connection out on its first query and returns it on commit or close,
+    # so work done before the first query (or after the commit) doesn't hold a pooled connection
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 #   ---- Non Relational Database (Mongodb)
 """
@@ -1,7 +1,8 @@
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
 from fastapi import Depends, HTTPException, status
 from app.configs import settings
+from app.dependencies.signing_keys import signing_keys
 from datetime import datetime,timedelta
 from typing import Dict,Any
 
@@ -18,7 +19,7 @@ def create_access_token(data:Dict[str,Any])->str:
         if hasattr(v, "value"):  # If Enum
             to_encode[k] = v.value
 
-    encoded_jwt=jwt.encode(to_encode,settings.SECRET_KEY,settings.ALGORITHMS)
+    encoded_jwt=signing_keys.sign(to_encode)
     return encoded_jwt
 
 #get token payload
@@ -28,7 +29,7 @@ def get_token_payload(token:str=Depends(oauth2_scheme))->Dict[str,Any]:
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},)
     try:
-        payload=jwt.decode(token,settings.SECRET_KEY,algorithms=[settings.ALGORITHMS])
+        payload=signing_keys.verify(token)
         return payload
     except JWTError:
         raise credential_exception
@@ -0,0 +1,70 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Hashable
+from app.configs import settings
+from app.dependencies.refresh_tokens import RedisTokenStore, refresh_tokens
+
+
+# remembers keys that recently had no match, for a short time, bounded in size;
+# per process, so a key discarded on one worker stays cached on the others
+# until it expires
+class NegativeCache:
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._expires: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    async def contains(self, key: Hashable) -> bool:
+        expires_at = self._expires.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            self._expires.pop(key, None)
+            return False
+        return True
+
+    async def add(self, key: Hashable):
+        if self.ttl <= 0:
+            return
+        self._expires[key] = time.monotonic() + self.ttl
+        self._expires.move_to_end(key)
+        # insertion order is expiry order, so the oldest entries go first
+        while len(self._expires) > self.max_entries:
+            self._expires.popitem(last=False)
+
+    async def discard(self, key: Hashable):
+        self._expires.pop(key, None)
+
+
+# the same, kept in a store shared by every worker and replica (Redis), so a
+# discard is seen everywhere at once; the store's TTLs bound its size
+class SharedNegativeCache:
+    def __init__(self, store, ttl: int, prefix: str):
+        self.store = store
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+    async def contains(self, key: str) -> bool:
+        return await self.store.get(self._key(key)) is not None
+
+    async def add(self, key: str):
+        if self.ttl > 0:
+            await self.store.set(self._key(key), "1", self.ttl)
+
+    async def discard(self, key: str):
+        await self.store.delete(self._key(key))
+
+
+def _make_unknown_emails():
+    # shares the refresh token store's Redis connection when there is one
+    if isinstance(refresh_tokens.store, RedisTokenStore):
+        return SharedNegativeCache(refresh_tokens.store, ttl=settings.LOGIN_NEGATIVE_CACHE_TTL, prefix="login:unknown")
+    return NegativeCache(ttl=settings.LOGIN_NEGATIVE_CACHE_TTL, max_entries=settings.LOGIN_NEGATIVE_CACHE_SIZE)
+
+
+# emails with no user or admin account; cleared when an account is created
+unknown_emails = _make_unknown_emails()
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import secrets
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+from fastapi import HTTPException, status
+from app.configs import settings
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis is optional, the local stand-in is used without it
+    redis = None
+
+
+# ---------------------------
+# Token store backends
+# ---------------------------
+class LocalTokenStore:
+    """Process-local stand-in for Redis, used in tests and when REDIS_URL is unset."""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[float, str]] = {}
+        self._sets: Dict[str, Set[str]] = {}
+
+    def _live(self, key: str) -> Optional[str]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._values.pop(key, None)
+            return None
+        return entry[1]
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._live(key)
+
+    async def getdel(self, key: str) -> Optional[str]:
+        value = self._live(key)
+        self._values.pop(key, None)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int):
+        self._values[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._values.pop(key, None)
+            self._sets.pop(key, None)
+
+    async def sadd(self, key: str, member: str, ttl: int):
+        self._sets.setdefault(key, set()).add(member)
+
+    async def smembers(self, key: str) -> Set[str]:
+        return set(self._sets.get(key, ()))
+
+    async def close(self):
+        self._values.clear()
+        self._sets.clear()
+
+
+class RedisTokenStore:
+    def __init__(self, url: str):
+        self._client = redis.from_url(url, decode_responses=True)  # type: ignore[union-attr]
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def getdel(self, key: str) -> Optional[str]:
+        # atomic, so a refresh token can only ever be redeemed once
+        return await self._client.getdel(key)
+
+    async def set(self, key: str, value: str, ttl: int):
+        await self._client.set(key, value, ex=ttl)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._client.delete(*keys)
+
+    async def sadd(self, key: str, member: str, ttl: int):
+        async with self._client.pipeline(transaction=True) as pipe:
+            await pipe.sadd(key, member).expire(key, ttl).execute()
+
+    async def smembers(self, key: str) -> Set[str]:
+        return await self._client.smembers(key)
+
+    async def close(self):
+        await self._client.aclose()
+
+
+# ---------------------------
+# Rotating refresh tokens
+# ---------------------------
+class RefreshTokens:
+    """Opaque, single-use refresh tokens grouped in families (one per login).
+
+    Only a hash of each token is stored. Redeeming a token deletes it and
+    issues the next one in the same family; presenting an already redeemed
+    token again means it leaked, so its whole family is revoked.
+    """
+
+    def __init__(self, store, ttl: int, prefix: str = "refresh"):
+        self.store = store
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _token_key(self, token: str) -> str:
+        return f"{self.prefix}:token:{hashlib.sha256(token.encode()).hexdigest()}"
+
+    def _used_key(self, token: str) -> str:
+        return f"{self.prefix}:used:{hashlib.sha256(token.encode()).hexdigest()}"
+
+    def _family_key(self, family: str) -> str:
+        return f"{self.prefix}:family:{family}"
+
+    def _user_key(self, role: Any, user_id: Any) -> str:
+        # users and admins live in separate tables, so their ids overlap;
+        # role may be a UserRole or its string value
+        account = "user" if getattr(role, "value", role) == "user" else "admin"
+        return f"{self.prefix}:{account}:{user_id}"
+
+    async def _store(self, claims: Dict[str, Any], family: str) -> str:
+        token = secrets.token_urlsafe(32)
+        await self.store.set(self._token_key(token), json.dumps({**claims, "family": family}), self.ttl)
+        # the family points at its one live token, so it can be revoked without knowing it
+        await self.store.set(self._family_key(family), self._token_key(token), self.ttl)
+        await self.store.sadd(self._user_key(claims["role"], claims["id"]), family, self.ttl)
+        return token
+
+    async def issue(self, claims: Dict[str, Any]) -> str:
+        """Start a new family for a fresh login; `claims` must carry sub, id and role."""
+        return await self._store(claims, family=secrets.token_urlsafe(16))
+
+    async def rotate(self, token: str) -> Tuple[Dict[str, Any], str]:
+        """Redeem `token`; returns its claims and the replacement token."""
+        raw = await self.store.getdel(self._token_key(token))
+        if raw is None:
+            reused_family = await self.store.get(self._used_key(token))
+            if reused_family is not None:
+                await self._revoke_family(reused_family)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired refresh token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        data = json.loads(raw)
+        family = data.pop("family")
+        await self.store.set(self._used_key(token), family, self.ttl)
+        return data, await self._store(data, family)
+
+    async def _revoke_family(self, family: str):
+        live_key = await self.store.getdel(self._family_key(family))
+        if live_key is not None:
+            await self.store.delete(live_key)
+
+    async def revoke(self, token: str):
+        """Log out: revoke the family `token` belongs to (a no-op for unknown tokens)."""
+        raw = await self.store.getdel(self._token_key(token))
+        if raw is not None:
+            await self._revoke_family(json.loads(raw)["family"])
+
+    async def revoke_user(self, role: Any, user_id: Any):
+        """Revoke every session of an account, e.g. after a password change or account deletion."""
+        user_key = self._user_key(role, user_id)
+        for family in await self.store.smembers(user_key):
+            await self._revoke_family(family)
+        await self.store.delete(user_key)
+
+
+def _make_store():
+    if settings.REDIS_URL:
+        if redis is not None:
+            return RedisTokenStore(settings.REDIS_URL)
+        print("REDIS_URL is set but the redis package is not installed, using local token store")
+    return LocalTokenStore()
+
+
+refresh_tokens = RefreshTokens(store=_make_store(), ttl=settings.REFRESH_TOKEN_EXPIRATION_TIME * 60)
@@ -0,0 +1,88 @@
+import base64
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+from jose import jwk, jwt, JWTError
+from app.configs import settings
+
+# JWK members that identify a public key, per key type (RFC 7638 thumbprint)
+THUMBPRINT_MEMBERS = {"RSA": ("e", "kty", "n"), "EC": ("crv", "kty", "x", "y")}
+
+
+def thumbprint(public_jwk: Dict[str, Any]) -> str:
+    members = {k: public_jwk[k] for k in THUMBPRINT_MEMBERS[public_jwk["kty"]]}
+    digest = hashlib.sha256(json.dumps(members, separators=(",", ":"), sort_keys=True).encode()).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+class SigningKeys:
+    """Signs access tokens and publishes the matching public keys as a JWKS.
+
+    With an asymmetric algorithm (RS*/ES*) only this service holds the private
+    key; other services verify against the JWKS, picking the key by the token's
+    `kid` header. Rotating: set the new JWT_PRIVATE_KEY and move the old public
+    key to JWT_PREVIOUS_PUBLIC_KEYS until tokens signed with it have expired.
+    HS* keeps the old shared SECRET_KEY behaviour and publishes no keys.
+    """
+
+    def __init__(self, algorithm: str, secret_key: str, private_key: Optional[str] = None,
+                 key_id: Optional[str] = None, previous_public_keys: Optional[List[str]] = None):
+        self.algorithm = algorithm
+        self.asymmetric = not algorithm.startswith("HS")
+        self._secret_key = secret_key
+        self._private_key = None
+        self.kid: Optional[str] = None
+        # kid -> public key, for verifying here and for the JWKS document
+        self._public_keys: Dict[str, Any] = {}
+        self._jwks: List[Dict[str, Any]] = []
+        if not self.asymmetric:
+            return
+
+        # every worker and replica must sign with the same key, or tokens fail
+        # verification depending on which replica served the JWKS
+        if not private_key:
+            raise RuntimeError(f"{algorithm} needs JWT_PRIVATE_KEY or JWT_PRIVATE_KEY_FILE to be set")
+        self._private_key = jwk.construct(private_key, algorithm)
+        self.kid = self._add_public_key(self._private_key.public_key(), key_id)
+        for pem in previous_public_keys or []:
+            self._add_public_key(jwk.construct(pem, algorithm))
+
+    def _add_public_key(self, public_key: Any, kid: Optional[str] = None) -> str:
+        public_jwk = public_key.to_dict()
+        kid = kid or thumbprint(public_jwk)
+        self._public_keys[kid] = public_key
+        self._jwks.append({**public_jwk, "kid": kid, "use": "sig", "alg": self.algorithm})
+        return kid
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        if not self.asymmetric:
+            return jwt.encode(claims, self._secret_key, self.algorithm)
+        return jwt.encode(claims, self._private_key, self.algorithm, headers={"kid": self.kid})
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Return the token's claims; raises JWTError if it is invalid."""
+        if not self.asymmetric:
+            return jwt.decode(token, self._secret_key, algorithms=[self.algorithm])
+        key = self._public_keys.get(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise JWTError("Unknown signing key")
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    def jwks(self) -> Dict[str, Any]:
+        return {"keys": self._jwks}
+
+
+def _read_private_key() -> Optional[str]:
+    if settings.JWT_PRIVATE_KEY_FILE:
+        with open(settings.JWT_PRIVATE_KEY_FILE) as f:
+            return f.read()
+    return settings.JWT_PRIVATE_KEY
+
+
+signing_keys = SigningKeys(
+    algorithm=settings.ALGORITHMS,
+    secret_key=settings.SECRET_KEY,
+    private_key=_read_private_key(),
+    key_id=settings.JWT_KEY_ID,
+    previous_public_keys=settings.JWT_PREVIOUS_PUBLIC_KEYS,
+)
@@ -1,14 +1,89 @@
 #utitly function
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from app.configs import settings
 
 #telling passlib about hashing method which is bcrypt
 pwd_context=CryptContext(schemes=["bcrypt"],deprecated="auto")
 
+
+# bcrypt costs ~200ms of CPU per call; running it on the event loop stalls every
+# other request, so calls go to a small dedicated pool (bcrypt releases the GIL,
+# so the threads hash in parallel) with a cap on how many may wait for it
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # submitted and not yet finished (queued + running); only touched on the event loop
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password operations in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        submitted = time.perf_counter()
+
+        def job() -> Tuple[Any, float, float]:
+            started = time.perf_counter()
+            return fn(*args), started, time.perf_counter()
+
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        self.total_wait += started - submitted
+        self.total_run += finished - started
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "running": min(self.pending, self.workers),
+            "queued": max(0, self.pending - self.workers),
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_queue_wait_ms": self.total_wait / self.completed * 1000 if self.completed else 0.0,
+            "avg_hash_ms": self.total_run / self.completed * 1000 if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
+
 #generate a hash for a our passowrd
-def hash_password(password:str)->str:
-    return pwd_context.hash(password)
+async def hash_password(password:str)->str:
+    return await password_hasher.hash(password)
 
 #verify hashed password
-def verify_password(plane_password,hashed_password):
-    return pwd_context.verify(plane_password,hashed_password)
+async def verify_password(plane_password,hashed_password):
+    return await password_hasher.verify(plane_password,hashed_password)
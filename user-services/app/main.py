@@ -1,17 +1,40 @@
 from fastapi import FastAPI
 from app.routes import user, login, admin 
-from app.database.db import Base, engine 
+from app.database.db import Base, engine, get_pool_stats
+from app.dependencies.utils import password_hasher
+from app.dependencies.refresh_tokens import refresh_tokens
+from app.dependencies.signing_keys import signing_keys
 
 app = FastAPI(version="1.0.0")
 
 @app.on_event("startup")
-def on_startup():
-    Base.metadata.create_all(bind=engine)
+async def on_startup():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    password_hasher.shutdown()
+    await refresh_tokens.store.close()
+    await engine.dispose()
 
 app.include_router(user.router)
 app.include_router(login.router)
 app.include_router(admin.router)
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to the User Service API"}
+
+@app.get("/db/pool")
+async def db_pool_stats():
+    return get_pool_stats()
+
+@app.get("/hash/pool")
+async def hash_pool_stats():
+    return password_hasher.stats()
+
+# public keys for verifying access tokens; other services cache them by kid
+@app.get("/.well-known/jwks.json")
+async def jwks():
+    return signing_keys.jwks()
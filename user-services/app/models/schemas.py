@@ -27,6 +27,10 @@ class UserLogin(BaseModel):
 class TokenData(BaseModel):
     _id:Optional[int]
 
+#opaque refresh token, for /token/refresh/ and /logout/
+class RefreshRequest(BaseModel):
+    refresh_token:str
+
 #to update user
 class UpdateUser(BaseModel):
     name:Optional[str]
@@ -1,11 +1,15 @@
 from fastapi import status, Depends,APIRouter,HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import models,schemas
 from app.dependencies.utils import hash_password
+from app.dependencies.cache import unknown_emails
+from app.dependencies.refresh_tokens import refresh_tokens
 from app.database import db
 from app.dependencies import auth_handler
+from app.dependencies.pagination import PageSize, cursor_id, encode_cursor
 from datetime import datetime
-from sqlalchemy import func
+from typing import Optional
+from sqlalchemy import func, select
 
 
 router=APIRouter(prefix="/admins",tags=["admin"])
@@ -13,9 +17,9 @@ router=APIRouter(prefix="/admins",tags=["admin"])
 #   role:superadmin ,register new admin
 @router.post("/create")
 async def create_admin(admin: schemas.UserCreate,
-                       db: Session = Depends(db.get_db)):
+                       db: AsyncSession = Depends(db.get_db)):
     #  Await the count_documents call
-    user_count = db.query(func.count(models.Admin.id)).scalar()
+    user_count = await db.scalar(select(func.count(models.Admin.id)))
     
     if user_count == 0:
         role = "superadmin"
@@ -23,63 +27,73 @@ async def create_admin(admin: schemas.UserCreate,
         role = "admin"
     
     #   Look for email exist, if any
-    existing_user = db.query(models.Admin).filter(models.Admin.email == admin.email).first()
+    existing_user = await db.scalar(select(models.Admin).filter(models.Admin.email == admin.email))
     
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Admin with this email already exists."
         )
-    
+
+    # end the read transaction so the pooled connection isn't held while bcrypt runs
+    await db.commit()
+
     # Hash the password
-    hashed_password = hash_password(admin.password)
+    hashed_password = await hash_password(admin.password)
     admin.password= hashed_password
     
     # Insert the new user
     new_admin=models.Admin(**admin.dict())
     db.add(new_admin)
-    db.commit()
-    db.refresh(new_admin)
+    await db.commit()
+    await db.refresh(new_admin)
+    await unknown_emails.discard(new_admin.email)
     return {"message": f"'{role}' created successfully."}
 
 # Get all users (superadmin only)
 @router.get("/all", dependencies=[Depends(auth_handler.requires_role("superadmin"))])
-def get_all_users(skip: int = 0, limit: int = 10,
-                        db: Session = Depends(db.get_db)):
-    # look for all  the user in Database
-    users = db.query(models.Admin).offset(skip).limit(limit).all()
+async def get_all_users(cursor: Optional[str] = None, limit: int = PageSize,
+                        db: AsyncSession = Depends(db.get_db)):
+    # look for a page of users in Database, keyset paginated on id
+    query = select(models.Admin)
+    if cursor:
+        query = query.filter(models.Admin.id > cursor_id(cursor))
+    users = (await db.scalars(query.order_by(models.Admin.id).limit(limit + 1))).all()
+    next_cursor = encode_cursor({"id": users[limit - 1].id}) if len(users) > limit else None
     # make a list of users
     users_list = []
-    for user in users:
+    for user in users[:limit]:
         user_dict = user.__dict__.copy()
+        user_dict.pop("_sa_instance_state", None)
         user_dict.pop("password", None)
         user_dict["id"] = str(user_dict.get("id"))
         if "created_at" in user_dict and isinstance(user_dict["created_at"], datetime):
             user_dict["created_at"] = user_dict["created_at"].isoformat()
         users_list.append(user_dict)
 
-    return {"users": users_list, "skip": skip, "limit": limit}
+    return {"users": users_list, "next_cursor": next_cursor, "limit": limit}
 
 
 # Delete an admin (superadmin only)
 @router.delete("/{admin_id}", dependencies=[Depends(auth_handler.requires_role("superadmin"))])
 async def delete_admin(admin_id: int,
-                       db: Session = Depends(db.get_db),
+                       db: AsyncSession = Depends(db.get_db),
                        current_user: dict = Depends(auth_handler.get_token_payload)):
     try:
         # Ensure a superadmin should not get deleted 
-        if admin_id == current_user.get("sub"):
+        if admin_id == current_user.get("id"):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You cannot delete your own admin account."
             )
         
-        result = db.query(models.Admin).filter(models.Admin.id == admin_id).first()
-        if result == 0:
+        result = await db.get(models.Admin, admin_id)
+        if result is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Admin not found or already deleted.")
     
-        db.delete(result)
-        db.commit()
+        await db.delete(result)
+        await db.commit()
+        await refresh_tokens.revoke_user("admin", admin_id)
         return {"message": "Admin deleted successfully"}
 
     except Exception as e:
@@ -1,42 +1,72 @@
 from fastapi import APIRouter, Depends, status, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.models import models 
+from sqlalchemy import literal, select, union_all
+from app.models import models, schemas
 from app.database import db
-from typing import Union
+from app.dependencies.cache import unknown_emails
 from app.dependencies.utils import verify_password
 from app.dependencies.auth_handler import create_access_token
+from app.dependencies.refresh_tokens import refresh_tokens
 
 router = APIRouter(tags=["Login"])
 
+# users and admins by email in one round trip; each branch is a unique-index
+# lookup and a user account wins over an admin account with the same email
+def account_by_email(email: str):
+    accounts = union_all(
+        select(models.User.id, models.User.email, models.User.password, models.User.role, literal(0).label("priority"))
+        .where(models.User.email == email),
+        select(models.Admin.id, models.Admin.email, models.Admin.password, models.Admin.role, literal(1).label("priority"))
+        .where(models.Admin.email == email),
+    ).subquery()
+    return select(accounts).order_by(accounts.c.priority).limit(1)
+
+# JWT/refresh-token claims for an account row; the role goes in as its plain
+# value so the claims stay JSON serializable for the refresh token store
+def token_claims(account) -> dict:
+    role = account.role.value if hasattr(account.role, 'value') else str(account.role)
+    return {"sub": account.email, "id": account.id, "role": role}
+
 @router.post("/login/")
 async def login_user(
-    user_credentials: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(db.get_db)
+    user_credentials: OAuth2PasswordRequestForm = Depends()
 ):
     email = user_credentials.username
     password = user_credentials.password
 
-    # Try to find user in Users table
-    user = db.query(models.User).filter(models.User.email == email).first()
+    # Recently unknown emails are rejected without touching the database
+    if await unknown_emails.contains(email):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email credentials")
 
-    # Try to find user in Admins table
-    admin = db.query(models.Admin).filter(models.Admin.email == email).first()
+    # session opened here rather than via get_db, so cached rejections never check out a connection
+    async with db.SessionLocal() as session:
+        db_user = (await session.execute(account_by_email(email))).first()
 
     # If not found in either → invalid email
-    if not user and not admin:
+    if db_user is None:
+        await unknown_emails.add(email)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email credentials")
 
-    # Pick whichever exists (User or Admin)
-    db_user: Union[models.User, models.Admin]
-    db_user = user if user else admin
-
     # Verify password
-    if not verify_password(password, db_user.password):  # type: ignore
+    if not await verify_password(password, db_user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
 
     # Create JWT token with role info
-    token_data = {"sub": db_user.email,"id":db_user.id ,"role": db_user.role} # type: ignore
+    token_data = token_claims(db_user)
+    access_token = create_access_token(token_data)
+    refresh_token = await refresh_tokens.issue(token_data)
+
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+# Renew an access token: a key lookup instead of a password check; the
+# refresh token is single-use and a new one is returned with every call
+@router.post("/token/refresh/")
+async def refresh_access_token(body: schemas.RefreshRequest):
+    token_data, refresh_token = await refresh_tokens.rotate(body.refresh_token)
     access_token = create_access_token(token_data)
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
-    return {"access_token": access_token, "token_type": "bearer"}
+# Revoke the session the refresh token belongs to
+@router.post("/logout/", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: schemas.RefreshRequest):
+    await refresh_tokens.revoke(body.refresh_token)
@@ -3,8 +3,11 @@ from fastapi.responses import JSONResponse
 from sqlalchemy.exc import IntegrityError
 from app.models import models ,schemas
 from app.dependencies.utils import hash_password
+from app.dependencies.cache import unknown_emails
+from app.dependencies.refresh_tokens import refresh_tokens
 from app.database import db
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.dependencies import auth_handler
 from typing import Any, Dict
 
@@ -13,9 +16,9 @@ router=APIRouter(prefix="/users",tags=["users"])
 #create new user to the app
 @router.post("/")
 async def CreateUser(user: schemas.UserCreate, 
-                    db: Session = Depends(db.get_db)):
+                    db: AsyncSession = Depends(db.get_db)):
     # Hash the password before saving
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password(user.password)
 
     user.password=hashed_password
 
@@ -24,16 +27,19 @@ async def CreateUser(user: schemas.UserCreate,
 
     try:
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
     except IntegrityError as ie:
-        db.rollback()
+        await db.rollback()
         # Likely duplicate email or phone
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User with this email or phone already exists")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+    # the account exists now, so it may log in straight away
+    await unknown_emails.discard(new_user.email)
+
     # prepare response without password and with DB-generated fields
     user_return = {
         "id": new_user.id,
@@ -48,17 +54,16 @@ async def CreateUser(user: schemas.UserCreate,
 
 # Get a single user by ID (superadmin only)
 @router.get("/{user_id}", dependencies=[Depends(auth_handler.requires_role("superadmin"))])
-async def get_user_by_id(user_id: str,
-                         db: Session = Depends(db.get_db)):
+async def get_user_by_id(user_id: int,
+                         db: AsyncSession = Depends(db.get_db)):
     try:
         # check for user exist in database
-        user = db.query(models.User).filter(models.User._id == user_id).first()
+        user = await db.get(models.User, user_id)
         if user is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         
         user_dict = user.__dict__.copy()
-        user_dict["_id"] = user_dict["_id"]
-        user_dict["phone"]=user_dict["phone"]
+        user_dict.pop("_sa_instance_state", None)
         user_dict.pop("password", None)
         user_dict["created_at"] = user_dict["created_at"].isoformat()
         if user_dict.get("updated_at"):
@@ -71,19 +76,20 @@ async def get_user_by_id(user_id: str,
 # Delete a user by ID (superadmin only)
 @router.delete("/{user_id}", dependencies=[Depends(auth_handler.requires_role("superadmin"))])
 async def delete_user(user_id:int,
-                      db: Session = Depends(db.get_db)):
+                      db: AsyncSession = Depends(db.get_db)):
     try:
         # Check if the user to be deleted exists
-        user_to_delete = db.query(models.User).filter(models.User.id == user_id).first()
+        user_to_delete = await db.get(models.User, user_id)
         if not user_to_delete:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
 
         # Delete the user from database
-        result = db.query(models.User).filter(models.User.id == user_id).delete(synchronize_session=False)
-        if result is None:
+        result = await db.execute(delete(models.User).where(models.User.id == user_id))
+        if not result.rowcount:  # type: ignore[attr-defined]
              raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found or already deleted.")
         
-        db.commit()
+        await db.commit()
+        await refresh_tokens.revoke_user("user", user_id)
         return {"message": "User deleted successfully"}
 
     except Exception as e:
@@ -92,8 +98,8 @@ async def delete_user(user_id:int,
 # Delete user self (user)
 @router.delete("/",dependencies=[Depends(auth_handler.requires_role("user"))])
 async def delete_user_self(payload:dict=Depends(auth_handler.get_token_payload),
-                db: Session = Depends(db.get_db)):
-    user_id_from_token = payload.get("sub")
+                db: AsyncSession = Depends(db.get_db)):
+    user_id_from_token = payload.get("id")
     if not user_id_from_token:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -104,43 +110,38 @@ async def delete_user_self(payload:dict=Depends(auth_handler.get_token_payload),
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user id in token")
 
-    user = db.query(models.User).filter(models.User.id == oid ).first()
-    if user:
-        result = db.query(models.User).filter(models.User.id == oid ).delete(synchronize_session=False)
-        if result is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found or already deleted"
-            )
-        db.commit()
+    await db.execute(delete(models.User).where(models.User.id == oid))
+    await db.commit()
+    await refresh_tokens.revoke_user("user", oid)
     return JSONResponse(status_code=status.HTTP_204_NO_CONTENT,
                         content={"message":"user deleted successfully"})
 
 #Role:User, profile
 @router.get("/profile/me",dependencies=[Depends(auth_handler.requires_role("user"))])
-async def get_profile(db: Session = Depends(db.get_db),
+async def get_profile(db: AsyncSession = Depends(db.get_db),
                 current_user:Dict[str, Any]=Depends(auth_handler.get_token_payload)):
-    user_id = current_user.get("sub")
+    user_id = current_user.get("id")
     try:
         oid = user_id
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user id in token")
-    user =  db.query(models.User).filter(models.User.id==oid).first()
+    user = await db.get(models.User, oid)
     if not user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="user not found")
-    user_data=user.__dict__
+    user_data=user.__dict__.copy()
+    user_data.pop("_sa_instance_state",None)
     user_data.pop("password",None)
     return user_data
 
 #Update profile (Users)
 @router.patch("/profile/update", dependencies=[Depends(auth_handler.requires_role("user"))])
-def update_user(
+async def update_user(
     user_update_data: schemas.UpdateUser,
-    db: Session = Depends(db.get_db),
+    db: AsyncSession = Depends(db.get_db),
     current_user: Dict[str, Any] = Depends(auth_handler.get_token_payload)
 ):
     update_data = user_update_data.dict(exclude_unset=True)
-    user_id = current_user.get("sub")
+    user_id = current_user.get("id")
 
     if not update_data:
         raise HTTPException(
@@ -149,10 +150,10 @@ def update_user(
         )
 
     if "password" in update_data:
-        update_data["password"] = hash_password(update_data["password"])
+        update_data["password"] = await hash_password(update_data["password"])
     
     # Get the user to update
-    user_to_update = db.query(models.User).filter(models.User.id == user_id).first()
+    user_to_update = await db.get(models.User, user_id)
     
     if not user_to_update:
         raise HTTPException(
@@ -165,5 +166,9 @@ def update_user(
         setattr(user_to_update, key, value)
     
     # Commit the changes to the database
-    db.commit()
+    await db.commit()
+
+    # a new password ends every existing session
+    if "password" in update_data:
+        await refresh_tokens.revoke_user("user", user_id)
     return {"message": "Profile updated"}
\ No newline at end of file
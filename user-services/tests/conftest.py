@@ -0,0 +1,6 @@
+import os
+import rsa
+
+# app.configs and the signing keys are loaded at import time
+os.environ.setdefault("ALGORITHMS", "RS256")
+os.environ.setdefault("JWT_PRIVATE_KEY", rsa.newkeys(2048)[1].save_pkcs1().decode())
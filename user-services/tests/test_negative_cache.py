@@ -0,0 +1,56 @@
+import asyncio
+import time
+from app.dependencies.cache import NegativeCache, SharedNegativeCache
+from app.dependencies.refresh_tokens import LocalTokenStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_local_cache_expires_and_discards(monkeypatch):
+    cache = NegativeCache(ttl=5, max_entries=10)
+    run(cache.add("ghost@example.com"))
+    assert run(cache.contains("ghost@example.com"))
+
+    run(cache.discard("ghost@example.com"))
+    assert not run(cache.contains("ghost@example.com"))
+
+    run(cache.add("ghost@example.com"))
+    now = time.monotonic()
+    monkeypatch.setattr("app.dependencies.cache.time.monotonic", lambda: now + 6)
+    assert not run(cache.contains("ghost@example.com"))
+
+
+def test_local_cache_is_bounded():
+    cache = NegativeCache(ttl=5, max_entries=2)
+    for n in range(3):
+        run(cache.add(f"ghost{n}@example.com"))
+    assert not run(cache.contains("ghost0@example.com"))
+    assert run(cache.contains("ghost2@example.com"))
+
+
+def test_signup_on_one_worker_clears_the_shared_cache_for_all():
+    # two workers, one shared store (Redis in production)
+    store = LocalTokenStore()
+    login_worker = SharedNegativeCache(store, ttl=30, prefix="login:unknown")
+    signup_worker = SharedNegativeCache(store, ttl=30, prefix="login:unknown")
+
+    run(login_worker.add("new@example.com"))
+    assert run(signup_worker.contains("new@example.com"))
+
+    run(signup_worker.discard("new@example.com"))
+    assert not run(login_worker.contains("new@example.com"))
+
+
+def test_shared_cache_does_not_store_plain_emails():
+    store = LocalTokenStore()
+    run(SharedNegativeCache(store, ttl=30, prefix="login:unknown").add("new@example.com"))
+    assert all("new@example.com" not in key for key in store._values)
+
+
+def test_zero_ttl_disables_caching():
+    store = LocalTokenStore()
+    for cache in (NegativeCache(ttl=0, max_entries=10), SharedNegativeCache(store, ttl=0, prefix="login:unknown")):
+        run(cache.add("ghost@example.com"))
+        assert not run(cache.contains("ghost@example.com"))
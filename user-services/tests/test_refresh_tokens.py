@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from app.dependencies.refresh_tokens import LocalTokenStore, RefreshTokens
+from app.models.models import UserRole
+from app.routes.login import token_claims
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def tokens():
+    return RefreshTokens(store=LocalTokenStore(), ttl=60)
+
+
+def claims_for(role=UserRole.user, account_id=1):
+    # the same claims login_user builds from an ORM row, enum role included
+    return token_claims(SimpleNamespace(email="driver@example.com", id=account_id, role=role))
+
+
+def assert_rejected(tokens, token):
+    with pytest.raises(HTTPException) as exc:
+        run(tokens.rotate(token))
+    assert exc.value.status_code == 401
+
+
+def test_login_claims_are_serializable(tokens):
+    claims = claims_for()
+    assert claims == {"sub": "driver@example.com", "id": 1, "role": "user"}
+    assert run(tokens.issue(claims))
+
+
+def test_rotate_returns_claims_and_a_new_token(tokens):
+    first = run(tokens.issue(claims_for()))
+    claims, second = run(tokens.rotate(first))
+    assert claims == claims_for()
+    assert second != first
+    claims, third = run(tokens.rotate(second))
+    assert claims == claims_for() and third not in (first, second)
+
+
+def test_replayed_token_revokes_the_family(tokens):
+    first = run(tokens.issue(claims_for()))
+    _, second = run(tokens.rotate(first))
+    other_login = run(tokens.issue(claims_for()))
+
+    assert_rejected(tokens, first)
+    # the live token of the leaked family is gone too
+    assert_rejected(tokens, second)
+    # other logins of the same user are untouched
+    assert run(tokens.rotate(other_login))
+
+
+def test_logout_revokes_the_family(tokens):
+    first = run(tokens.issue(claims_for()))
+    _, second = run(tokens.rotate(first))
+    run(tokens.revoke(second))
+    assert_rejected(tokens, second)
+
+
+@pytest.mark.parametrize("role", [UserRole.user, "user"])
+def test_revoke_user_ends_every_session(tokens, role):
+    sessions = [run(tokens.issue(claims_for())) for _ in range(3)]
+    _, sessions[0] = run(tokens.rotate(sessions[0]))
+    admin_session = run(tokens.issue(claims_for(role=UserRole.admin)))
+
+    run(tokens.revoke_user(role, 1))
+
+    for token in sessions:
+        assert_rejected(tokens, token)
+    # admin 1 is a different account than user 1
+    assert run(tokens.rotate(admin_session))
@@ -0,0 +1,33 @@
+import pytest
+import rsa
+from jose import JWTError, jwt
+from app.dependencies.signing_keys import SigningKeys
+
+
+def private_pem() -> str:
+    return rsa.newkeys(2048)[1].save_pkcs1().decode()
+
+
+def test_asymmetric_algorithm_requires_a_key():
+    with pytest.raises(RuntimeError):
+        SigningKeys("RS256", "secret", private_key=None)
+
+
+def test_tokens_carry_the_kid_published_in_the_jwks():
+    keys = SigningKeys("RS256", "secret", private_pem())
+    token = keys.sign({"sub": "a@b.c", "id": 1, "role": "user"})
+    assert jwt.get_unverified_header(token)["kid"] == keys.kid
+    assert [key["kid"] for key in keys.jwks()["keys"]] == [keys.kid]
+    assert keys.verify(token)["sub"] == "a@b.c"
+
+
+def test_previous_keys_still_verify_after_rotation():
+    old = SigningKeys("RS256", "secret", private_pem())
+    token = old.sign({"sub": "a@b.c"})
+    old_public = old._private_key.public_key().to_pem().decode()
+
+    rotated = SigningKeys("RS256", "secret", private_pem(), previous_public_keys=[old_public])
+    assert rotated.kid != old.kid
+    assert rotated.verify(token)["sub"] == "a@b.c"
+    with pytest.raises(JWTError):
+        SigningKeys("RS256", "secret", private_pem()).verify(token)